@@ -14,6 +14,8 @@ class TrainingConfig(BaseModel):
     db_dataset_bucket_name: Optional[str] = None
     db_dataset_name: Optional[str] = None
     db_dataset_bucket_pwd: Optional[str] = None
+    # 流式读取: 不暂存数据集, 训练脚本通过 dataset 参数直接从存储桶按需读取(仅云存储数据集)
+    stream_dataset: Optional[bool] = False
     
     # ========== 训练脚本来源相关 ==========
     use_local_script: bool
@@ -38,6 +40,27 @@ class TrainingConfig(BaseModel):
     local_pretrained_model_path: Optional[str] = None
     pretrained_model_name: Optional[str] = None
     
+    # ========== 训练产物相关 ==========
+    # 上传时对未压缩格式的产物进行gzip压缩
+    compress_artifacts: Optional[bool] = False
+
+    # ========== CPU导出与基准测试相关 ==========
+    # 训练后在CPU上测试ONNX推理延迟与吞吐量(ONNX导出在发布产物时进行, 与此开关无关)
+    cpu_benchmark: Optional[bool] = False
+    benchmark_int8: Optional[bool] = False
+    benchmark_batch_sizes: Optional[list[int]] = [1, 4, 8]
+
+    # ========== 分布式训练相关 ==========
+    # 大于1时占用多个worker槽位, 以gloo后端进行数据并行训练(脚本需声明 distributed 参数)
+    world_size: Optional[int] = 1
+
+    # ========== 性能分析相关 ==========
+    # 对模块加载与训练阶段进行栈采样与内存峰值统计, 结果上传到MLflow运行的 profile/ 下
+    profile_run: Optional[bool] = False
+    profile_cprofile: Optional[bool] = False
+    # 大于0时对若干训练步开启 torch CPU profiler(脚本需声明 profile_step 参数)
+    profile_torch_steps: Optional[int] = 0
+
     # 训练超参数
     hyperparams: dict = {}
     
\ No newline at end of file
@@ -0,0 +1,23 @@
+import time
+import redis
+from backend_common.run_registry import REDIS_POOL
+
+# 取消标记保留时长, 足以覆盖排队与宽限期
+CANCEL_FLAG_TTL = 24 * 3600
+
+
+def request_cancel(run_id: str) -> None:
+    """为运行设置取消标记, 正在运行的任务会在下一次进度上报时响应"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    r.set(f"cancel:{run_id}", time.time(), ex=CANCEL_FLAG_TTL)
+
+
+def cancel_requested_at(run_id: str) -> float:
+    """返回取消请求的时间戳, 未请求取消时返回 None"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    value = r.get(f"cancel:{run_id}")
+    return float(value) if value is not None else None
+
+
+def is_cancel_requested(run_id: str) -> bool:
+    return cancel_requested_at(run_id) is not None
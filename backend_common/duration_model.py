@@ -0,0 +1,184 @@
+import os
+import json
+import time
+import heapq
+import hashlib
+import redis
+from backend_common.run_registry import REDIS_POOL
+
+# 各阶段的工作量定义, 预测耗时 = 工作量 × 历史单位耗时(EWMA)
+#   staging:  数据集字节数(web端暂存数据集; 流式数据集不暂存, 为0)
+#   load:     1(加载训练模块)
+#   train:    epochs × 文件数 × (imgsz/640)^2
+#   finalize: 数据集字节数(产物上传与数据集归档)
+PHASES = ("staging", "load", "train", "finalize")
+# 登记运行(进入队列)时暂存已完成, 排队与运行中的预测只包含之后的阶段
+_WORKER_PHASES = ("load", "train", "finalize")
+EWMA_ALPHA = 0.3
+HISTORY_SIZE = 1000
+# 没有任何历史记录时的保守估计
+DEFAULT_RUN_SECONDS = float(os.getenv("DEFAULT_RUN_SECONDS", 3600))
+# 未在超参数中指定时使用模板默认值
+_DEFAULT_HYPERPARAMS = {"epochs": 100, "batch": 16, "imgsz": 640}
+
+
+def run_features(
+    dataset_dir: str,
+    script_path: str,
+    hyperparams: dict,
+    dataset_size: tuple = None
+) -> dict:
+    """提取用于耗时预测的运行特征
+
+    Args:
+        dataset_dir: 暂存后的数据集目录
+        script_path: 训练脚本路径
+        hyperparams: 训练超参数
+        dataset_size: (字节数, 文件数); 流式数据集不暂存到本地, 由调用方按存储桶列举结果提供
+    """
+    if dataset_size is not None:
+        dataset_bytes, file_count = dataset_size
+    else:
+        dataset_bytes = 0
+        file_count = 0
+        for root, _, files in os.walk(dataset_dir):
+            for file in files:
+                dataset_bytes += os.path.getsize(os.path.join(root, file))
+                file_count += 1
+    with open(script_path, "rb") as f:
+        script_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+    features = {
+        "script_hash": script_hash,
+        "dataset_bytes": dataset_bytes,
+        "file_count": file_count,
+        "stream": dataset_size is not None
+    }
+    for key, default in _DEFAULT_HYPERPARAMS.items():
+        value = hyperparams.get(key, default)
+        features[key] = value if isinstance(value, (int, float)) else default
+    return features
+
+
+def _work_units(features: dict, phase: str) -> float:
+    if phase == "staging" and features.get("stream"):
+        return 0.0
+    if phase in ("staging", "finalize"):
+        return max(features["dataset_bytes"], 1)
+    if phase == "train":
+        return max(
+            features["epochs"] * features["file_count"] * (features["imgsz"] / 640) ** 2,
+            1
+        )
+    return 1.0
+
+
+def record_phase(features: dict, phase: str, seconds: float) -> None:
+    """记录一次阶段耗时, 更新该脚本与全局的单位耗时估计
+
+    Args:
+        features: run_features 返回的运行特征
+        phase: 阶段名(见 PHASES)
+        seconds: 实际耗时(秒)
+    """
+    if phase not in PHASES:
+        raise ValueError(f"未知的阶段: {phase}")
+    units = _work_units(features, phase)
+    if not units:
+        return
+    rate = seconds / units
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    keys = [f"duration:rates:{features['script_hash']}", "duration:rates:global"]
+    # 读取-更新 EWMA 的竞争只会丢失一次样本, 不需要加锁
+    old_rates = r.hmget(keys[0], phase), r.hmget(keys[1], phase)
+    with r.pipeline() as pipe:
+        for key, (old,) in zip(keys, old_rates):
+            new = rate if old is None else EWMA_ALPHA * rate + (1 - EWMA_ALPHA) * float(old)
+            pipe.hset(key, phase, new)
+        pipe.lpush("duration:history", json.dumps({
+            "features": features,
+            "phase": phase,
+            "seconds": seconds,
+            "recorded_at": time.time()
+        }))
+        pipe.ltrim("duration:history", 0, HISTORY_SIZE - 1)
+        pipe.execute()
+
+
+def predict_duration(features: dict, phases: tuple = PHASES) -> dict:
+    """预测运行各阶段的耗时(秒)
+
+    优先使用同一脚本的历史单位耗时, 其次使用全局估计;
+    完全没有历史时返回 DEFAULT_RUN_SECONDS
+
+    Args:
+        features: run_features 返回的运行特征
+        phases: 需要预测的阶段, 默认为全部阶段
+    """
+    if not features:
+        return {"total": DEFAULT_RUN_SECONDS, "phases": {}, "source": "default"}
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    with r.pipeline() as pipe:
+        pipe.hgetall(f"duration:rates:{features['script_hash']}")
+        pipe.hgetall("duration:rates:global")
+        script_rates, global_rates = pipe.execute()
+
+    if not script_rates and not global_rates:
+        return {"total": DEFAULT_RUN_SECONDS, "phases": {}, "source": "default"}
+    predicted = {}
+    for phase in phases:
+        rate = script_rates.get(phase) or global_rates.get(phase)
+        if rate is not None:
+            predicted[phase] = float(rate) * _work_units(features, phase)
+    return {
+        "total": sum(predicted.values()),
+        "phases": predicted,
+        "source": "script" if script_rates else "global"
+    }
+
+
+def estimate_queue(running: list, queued: list, slots: int, now: float = None) -> dict:
+    """模拟FIFO调度, 估计排队运行的开始与结束时间
+
+    Args:
+        running: 运行中的记录(需含 started_at 与 features)
+        queued: 排队中的记录, 按提交时间升序(需含 features)
+        slots: 可用的worker槽位数
+        now: 当前时间戳
+    Returns:
+        各运行的 ETA、积压的 worker 小时数与清空队列的预计时间
+    """
+    now = now or time.time()
+    slots = max(slots, 1)
+    free_at = []
+    backlog_seconds = 0.0
+    running_eta = []
+    for run in running:
+        predicted = predict_duration(run.get("features"), _WORKER_PHASES)["total"]
+        remaining = max(predicted - (now - run.get("started_at", now)), 0)
+        backlog_seconds += remaining
+        free_at.append(now + remaining)
+        running_eta.append({"run_id": run["run_id"], "eta_finish": now + remaining})
+    # 槽位多于运行数时, 空闲槽位立即可用; 运行数多于槽位(统计滞后)时只保留最早空出的槽位
+    free_at = sorted(free_at)[:slots] + [now] * max(slots - len(free_at), 0)
+    heapq.heapify(free_at)
+
+    queued_eta = []
+    for run in queued:
+        predicted = predict_duration(run.get("features"), _WORKER_PHASES)["total"]
+        start = heapq.heappop(free_at)
+        heapq.heappush(free_at, start + predicted)
+        backlog_seconds += predicted
+        queued_eta.append({
+            "run_id": run["run_id"],
+            "predicted_seconds": predicted,
+            "eta_start": start,
+            "eta_finish": start + predicted
+        })
+
+    return {
+        "slots": slots,
+        "running": running_eta,
+        "queued": queued_eta,
+        "backlog_worker_hours": backlog_seconds / 3600,
+        "drain_at": max(free_at)
+    }
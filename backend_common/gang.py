@@ -0,0 +1,47 @@
+import redis
+from backend_common.run_registry import REDIS_POOL, get_runs
+
+# 分布式训练组占用的worker槽位 {run_id: world_size}
+_GANGS_KEY = "ddp:gangs"
+_TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+
+def reserve_gang(run_id: str, world_size: int, slots: int) -> tuple:
+    """为分布式训练组整体预留worker槽位
+
+    每个rank在就位等待时占用一个槽位, 多个训练组各自只拿到部分槽位时会互相等待直到超时;
+    提交时保证所有训练组的 world_size 之和不超过槽位总数, 使已发送的训练组总能全部就位
+
+    Args:
+        run_id: 训练运行ID
+        world_size: 训练组大小
+        slots: 队列的worker槽位总数
+    Returns:
+        (是否预留成功, 已被其他训练组占用的槽位数)
+    """
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    lock = r.lock("lock:ddp:gangs", timeout=10, blocking_timeout=5)
+    if not lock.acquire():
+        # 并发提交过多, 视为暂时无法预留
+        return False, None
+    try:
+        gangs = {gang: int(size) for gang, size in r.hgetall(_GANGS_KEY).items()}
+        # 已结束但未释放的训练组(如rank 0被强制终止)不再占用槽位
+        finished = [
+            run["run_id"] for run in get_runs(list(gangs), include_progress=False)
+            if run["state"] in _TERMINAL_STATES
+        ]
+        if finished:
+            r.hdel(_GANGS_KEY, *finished)
+        used = sum(size for gang, size in gangs.items() if gang not in finished)
+        if used + world_size > slots:
+            return False, used
+        r.hset(_GANGS_KEY, run_id, world_size)
+    finally:
+        lock.release()
+    return True, used
+
+
+def release_gang(run_id: str) -> None:
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    r.hdel(_GANGS_KEY, run_id)
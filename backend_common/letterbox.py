@@ -0,0 +1,21 @@
+import numpy as np
+
+
+def letterbox(im: np.ndarray, imgsz: int) -> tuple:
+    """按长边等比缩放到 imgsz 并居中填充(灰色114), 基准测试与推理服务共用
+
+    Args:
+        im: cv2 读取的 BGR 图片(H×W×3)
+        imgsz: 输入尺寸
+    Returns:
+        (3×imgsz×imgsz 的 RGB uint8 数组, 缩放比例, (上, 左)填充)
+    """
+    import cv2
+
+    h, w = im.shape[:2]
+    r = imgsz / max(h, w)
+    im = cv2.resize(im, (round(w * r), round(h * r)), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - im.shape[0]) // 2, (imgsz - im.shape[1]) // 2
+    canvas[top:top + im.shape[0], left:left + im.shape[1]] = im
+    return canvas[:, :, ::-1].transpose(2, 0, 1), r, (top, left)
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import redis
+
+# 运行登记表与进度共用同一个 Redis, 但键不设置过期时间, 训练结束后仍可查询历史
+REDIS_POOL = redis.ConnectionPool(
+    host=os.getenv("REDIS_HOST", "redis"),
+    port=6379,
+    db=0,
+    decode_responses=True
+)
+
+RUN_STATES = ("queued", "running", "succeeded", "failed", "cancelled")
+# 以 JSON 存储的字段, 其余字段按字符串原样存储
+_JSON_FIELDS = ("config", "metrics", "features", "task_ids", "extra")
+_FLOAT_FIELDS = ("created_at", "started_at", "finished_at", "accuracy")
+
+
+def _run_key(run_id: str) -> str:
+    return f"run:{run_id}"
+
+
+def _jsonable(value):
+    """将训练脚本返回的 numpy 标量/数组转换为可序列化对象"""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+def _encode(fields: dict) -> dict:
+    encoded = {}
+    for key, value in fields.items():
+        if value is None:
+            continue
+        if key in _JSON_FIELDS:
+            encoded[key] = json.dumps(value, ensure_ascii=False, default=_jsonable)
+        elif key in _FLOAT_FIELDS:
+            encoded[key] = float(value)
+        else:
+            encoded[key] = str(value)
+    return encoded
+
+
+def _decode(fields: dict) -> dict:
+    if not fields:
+        return None
+    decoded = dict(fields)
+    for key in _JSON_FIELDS:
+        if key in decoded:
+            decoded[key] = json.loads(decoded[key])
+    for key in _FLOAT_FIELDS:
+        if key in decoded:
+            decoded[key] = float(decoded[key])
+    return decoded
+
+
+def summarize_config(task_config: dict) -> dict:
+    """提取训练配置摘要, 避免在登记表中保存密码等敏感字段"""
+    if task_config.get("use_local_dataset"):
+        dataset = f"本地:{task_config.get('local_dataset_path')}"
+    else:
+        dataset = f"数据库:{task_config.get('db_dataset_bucket_name')}/{task_config.get('db_dataset_name')}"
+    if task_config.get("use_local_script"):
+        script = f"本地:{task_config.get('local_script_path')}"
+    else:
+        script = f"数据库:training-scripts/{task_config.get('db_script_name')}"
+    return {
+        "dataset": dataset,
+        "script": script,
+        "hyperparams": task_config.get("hyperparams", {})
+    }
+
+
+def register_run(
+    run_id: str,
+    task_id: str,
+    task_config: dict,
+    features: dict = None,
+    queue: str = "celery",
+    task_ids: list = None
+) -> None:
+    """提交训练任务时登记运行记录
+
+    Args:
+        run_id: 训练运行ID
+        task_id: Celery任务ID
+        task_config: 模型训练参数
+        features: 用于耗时预测的运行特征(可选)
+        queue: 任务所在的Celery队列
+        task_ids: 分布式训练时各rank的Celery任务ID
+    """
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    now = time.time()
+    train_name = task_config.get("train_name", "train")
+    with r.pipeline() as pipe:
+        pipe.hset(_run_key(run_id), mapping=_encode({
+            "run_id": run_id,
+            "task_id": task_id,
+            "train_name": train_name,
+            "state": "queued",
+            "created_at": now,
+            "queue": queue,
+            "config": summarize_config(task_config),
+            "features": features,
+            "task_ids": task_ids
+        }))
+        # 按提交时间排序的索引, 用于分页与过滤
+        pipe.zadd("runs:index", {run_id: now})
+        pipe.zadd("runs:state:queued", {run_id: now})
+        pipe.zadd(f"runs:name:{train_name}", {run_id: now})
+        pipe.execute()
+
+
+def update_run(run_id: str, state: str = None, **fields) -> None:
+    """更新运行记录的状态、耗时与最终指标
+
+    Args:
+        run_id: 训练运行ID
+        state: 新状态(见 RUN_STATES), 为 None 时仅更新字段
+        fields: 其他需要更新的字段, 如 started_at、metrics、error
+    """
+    if state is not None and state not in RUN_STATES:
+        raise ValueError(f"未知的运行状态: {state}")
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    key = _run_key(run_id)
+    created_at = r.zscore("runs:index", run_id)
+    if created_at is None:
+        # 未登记的运行(如直接调用任务)不写入登记表
+        return
+    if state is not None:
+        fields["state"] = state
+    with r.pipeline() as pipe:
+        if fields:
+            pipe.hset(key, mapping=_encode(fields))
+        if state is not None:
+            for other in RUN_STATES:
+                if other != state:
+                    pipe.zrem(f"runs:state:{other}", run_id)
+            pipe.zadd(f"runs:state:{state}", {run_id: created_at})
+        pipe.execute()
+
+
+def get_run(run_id: str) -> dict:
+    """获取单个运行记录, 不存在时返回 None"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    return _decode(r.hgetall(_run_key(run_id)))
+
+
+def list_runs(offset: int = 0, limit: int = 50, state: str = None, train_name: str = None) -> dict:
+    """按提交时间倒序分页列出运行记录
+
+    Args:
+        offset: 分页起始位置
+        limit: 每页数量
+        state: 按状态过滤
+        train_name: 按训练名称过滤
+    Returns:
+        {"total": 总数, "runs": 运行记录列表}
+    """
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    index_keys = []
+    if state:
+        index_keys.append(f"runs:state:{state}")
+    if train_name:
+        index_keys.append(f"runs:name:{train_name}")
+
+    if len(index_keys) > 1:
+        # 多个过滤条件时求交集, 结果短暂缓存以便连续翻页
+        index_key = f"runs:query:{state}:{train_name}"
+        if not r.exists(index_key):
+            with r.pipeline() as pipe:
+                pipe.zinterstore(index_key, {key: 1 for key in index_keys}, aggregate="MAX")
+                pipe.expire(index_key, 10)
+                pipe.execute()
+    else:
+        index_key = index_keys[0] if index_keys else "runs:index"
+
+    with r.pipeline() as pipe:
+        pipe.zcard(index_key)
+        pipe.zrevrange(index_key, offset, offset + limit - 1)
+        total, run_ids = pipe.execute()
+
+    return {"total": total, "runs": get_runs(run_ids, include_progress=False)}
+
+
+def get_runs(run_ids: list, include_progress: bool = True) -> list:
+    """批量查询运行记录, 所有键通过一次管道往返取回
+
+    Args:
+        run_ids: 训练运行ID列表
+        include_progress: 是否合并 progress:{run_id} 中的实时进度
+    Returns:
+        与 run_ids 一一对应的记录列表, 不存在的运行为 {"run_id": ..., "state": "unknown"}
+    """
+    if not run_ids:
+        return []
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    with r.pipeline(transaction=False) as pipe:
+        for run_id in run_ids:
+            pipe.hgetall(_run_key(run_id))
+            if include_progress:
+                pipe.get(f"progress:{run_id}")
+        replies = pipe.execute()
+
+    step = 2 if include_progress else 1
+    runs = []
+    for i, run_id in enumerate(run_ids):
+        run = _decode(replies[i * step]) or {"run_id": run_id, "state": "unknown"}
+        if include_progress:
+            progress = replies[i * step + 1]
+            run["progress"] = json.loads(progress) if progress else None
+        runs.append(run)
+    return runs
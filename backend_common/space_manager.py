@@ -0,0 +1,96 @@
+import os
+import json
+import time
+import shutil
+import redis
+from backend_common.run_registry import REDIS_POOL
+
+# 共享数据卷(web与worker的 shared_data)
+DATA_ROOT = os.getenv("DATA_ROOT", "/data")
+# 预计占用超过该比例时拒绝(或等待)新提交
+DISK_HIGH_WATERMARK = float(os.getenv("DISK_HIGH_WATERMARK", 0.9))
+# 为训练输出(检查点、导出模型等)额外预留的空间
+DISK_OUTPUT_ALLOWANCE = int(os.getenv("DISK_OUTPUT_ALLOWANCE", 1024 ** 3))
+# 流式数据集模式下本地块缓存的上限, 提交时按此预留空间而不是数据集大小
+STREAM_CACHE_BYTES = int(os.getenv("STREAM_CACHE_BYTES", 2 * 1024 ** 3))
+
+_RESERVATIONS_KEY = "space:reservations"
+
+
+def _outstanding(reservations: dict) -> int:
+    """预留中尚未落盘的部分; 已暂存的数据集已计入磁盘用量, 不能重复计算"""
+    total = 0
+    for value in reservations.values():
+        reservation = json.loads(value)
+        total += max(reservation["expected"] - reservation["staged"], 0)
+    return total
+
+
+def volume_usage() -> dict:
+    """共享数据卷的当前用量与预留情况"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    usage = shutil.disk_usage(DATA_ROOT)
+    reservations = r.hgetall(_RESERVATIONS_KEY)
+    reserved = _outstanding(reservations)
+    return {
+        "total_bytes": usage.total,
+        "used_bytes": usage.used,
+        "free_bytes": usage.free,
+        "reserved_bytes": reserved,
+        "reservations": len(reservations),
+        "projected_ratio": (usage.used + reserved) / usage.total,
+        "high_watermark": DISK_HIGH_WATERMARK
+    }
+
+
+def try_reserve(run_id: str, dataset_bytes: int) -> tuple:
+    """为新运行预留空间(数据集 + 输出预留), 超过水位线时不预留
+
+    Args:
+        run_id: 训练运行ID
+        dataset_bytes: 预计的数据集大小
+    Returns:
+        (是否预留成功, 当前用量); 并发提交过多导致取锁超时时返回 (False, None), 由调用方重试
+    """
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    expected = dataset_bytes + DISK_OUTPUT_ALLOWANCE
+    # 检查与预留必须原子执行, 否则并发提交会同时通过检查
+    lock = r.lock("lock:space", timeout=10, blocking_timeout=5)
+    if not lock.acquire():
+        return False, None
+    try:
+        usage = volume_usage()
+        projected = usage["used_bytes"] + usage["reserved_bytes"] + expected
+        if projected > usage["total_bytes"] * DISK_HIGH_WATERMARK:
+            return False, usage
+        r.hset(_RESERVATIONS_KEY, run_id, json.dumps({
+            "expected": expected,
+            "staged": 0,
+            "reserved_at": time.time()
+        }))
+    finally:
+        lock.release()
+    return True, usage
+
+
+def mark_staged(run_id: str, staged_bytes: int) -> None:
+    """数据集写入完成后记录实际落盘大小"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    value = r.hget(_RESERVATIONS_KEY, run_id)
+    if value is None:
+        return
+    reservation = json.loads(value)
+    reservation["staged"] = staged_bytes
+    r.hset(_RESERVATIONS_KEY, run_id, json.dumps(reservation))
+
+
+def release(run_id: str) -> None:
+    """运行目录删除后释放预留"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    r.hdel(_RESERVATIONS_KEY, run_id)
+
+
+def reservations() -> dict:
+    """全部空间预留 {run_id: {"expected", "staged", "reserved_at"}}"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    return {run_id: json.loads(value) for run_id, value in r.hgetall(_RESERVATIONS_KEY).items()}
@@ -0,0 +1,117 @@
+import os
+import asyncio
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import urllib3
+from minio import Minio
+
+# ========== 连接池/超时/重试配置 ==========
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "minio:9000")
+MINIO_POOL_SIZE = int(os.getenv("MINIO_POOL_SIZE", 16))
+MINIO_CONNECT_TIMEOUT = float(os.getenv("MINIO_CONNECT_TIMEOUT", 5))
+MINIO_READ_TIMEOUT = float(os.getenv("MINIO_READ_TIMEOUT", 60))
+MINIO_MAX_RETRIES = int(os.getenv("MINIO_MAX_RETRIES", 3))
+MINIO_RETRY_BACKOFF = float(os.getenv("MINIO_RETRY_BACKOFF", 0.5))
+
+
+def create_minio_client(
+    pool_size: int = None,
+    connect_timeout: float = None,
+    read_timeout: float = None,
+    max_retries: int = None,
+    retry_backoff: float = None
+) -> Minio:
+    """创建带连接池、超时与重试策略的MinIO客户端
+
+    未指定的参数取自环境变量 MINIO_POOL_SIZE / MINIO_CONNECT_TIMEOUT /
+    MINIO_READ_TIMEOUT / MINIO_MAX_RETRIES / MINIO_RETRY_BACKOFF
+    """
+    http_client = urllib3.PoolManager(
+        maxsize=pool_size or MINIO_POOL_SIZE,
+        # 连接池耗尽时等待空闲连接, 而不是创建池外连接
+        block=True,
+        timeout=urllib3.Timeout(
+            connect=connect_timeout or MINIO_CONNECT_TIMEOUT,
+            read=read_timeout or MINIO_READ_TIMEOUT
+        ),
+        retries=urllib3.Retry(
+            total=MINIO_MAX_RETRIES if max_retries is None else max_retries,
+            backoff_factor=MINIO_RETRY_BACKOFF if retry_backoff is None else retry_backoff,
+            status_forcelist=[500, 502, 503, 504]
+        )
+    )
+    return Minio(
+        endpoint=MINIO_ENDPOINT,
+        access_key=os.environ["AWS_ACCESS_KEY_ID"],
+        secret_key=os.environ["AWS_SECRET_ACCESS_KEY"],
+        secure=False,
+        http_client=http_client
+    )
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_minio_client() -> Minio:
+    """获取进程内共享的MinIO客户端(线程安全, 供worker的多线程任务复用连接池)"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_minio_client()
+    return _client
+
+
+class AsyncStorage:
+    """供FastAPI事件循环使用的异步存储接口
+
+    minio-py 没有原生异步实现, 这里将阻塞调用派发到与连接池等大的专用线程池,
+    并发请求的MinIO I/O可以相互重叠, 不会阻塞事件循环
+    """
+
+    def __init__(self, client: Minio = None, max_workers: int = None):
+        self.client = client or create_minio_client()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers or MINIO_POOL_SIZE,
+            thread_name_prefix="minio"
+        )
+
+    async def run(self, func, *args, **kwargs):
+        """在存储线程池中执行任意阻塞的客户端调用"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def bucket_exists(self, bucket: str) -> bool:
+        return await self.run(self.client.bucket_exists, bucket)
+
+    async def stat_object(self, bucket: str, object_name: str):
+        return await self.run(self.client.stat_object, bucket, object_name)
+
+    async def get_object_bytes(self, bucket: str, object_name: str) -> bytes:
+        """读取整个对象内容并释放连接"""
+        def _read():
+            response = self.client.get_object(bucket, object_name)
+            try:
+                return response.read()
+            finally:
+                response.close()
+                response.release_conn()
+        return await self.run(_read)
+
+    async def fget_object(self, bucket: str, object_name: str, file_path: str):
+        return await self.run(self.client.fget_object, bucket, object_name, file_path)
+
+    async def fput_object(self, bucket: str, object_name: str, file_path: str, **kwargs):
+        return await self.run(self.client.fput_object, bucket, object_name, file_path, **kwargs)
+
+    async def put_object(self, bucket: str, object_name: str, data, length: int, **kwargs):
+        return await self.run(self.client.put_object, bucket, object_name, data, length, **kwargs)
+
+    async def list_objects(self, bucket: str, prefix: str = None, recursive: bool = False) -> list:
+        """列举对象(一次性取回全部结果, 避免在事件循环中迭代阻塞的生成器)"""
+        return await self.run(lambda: list(self.client.list_objects(bucket, prefix=prefix, recursive=recursive)))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
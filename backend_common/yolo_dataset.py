@@ -0,0 +1,106 @@
+import os
+
+# 与 ultralytics 一致的图片扩展名(预检、基准测试、图片缓存与分布式分片共用)
+IMG_FORMATS = {".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp"}
+
+
+def is_image(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in IMG_FORMATS
+
+
+def dataset_root(data: dict, dataset_dir: str, isdir=os.path.isdir) -> tuple:
+    """解析 dataset.yaml 的 path 字段, 返回 (数据集根目录, 是否回退到 dataset_dir)
+
+    未指定时为 dataset.yaml 所在目录, 相对路径相对于该目录;
+    绝对路径通常是上传者本机的路径, 不存在时回退到 dataset_dir
+
+    Args:
+        data: dataset.yaml 的内容
+        dataset_dir: dataset.yaml 所在目录(或对象前缀)
+        isdir: 目录存在性检查, 解析存储桶中的对象名时由调用方提供
+    """
+    root = data.get("path")
+    if not root:
+        return os.path.normpath(dataset_dir), False
+    if not os.path.isabs(root):
+        return os.path.normpath(os.path.join(dataset_dir, root)), False
+    if not isdir(root):
+        return os.path.normpath(dataset_dir), True
+    return os.path.normpath(root), False
+
+
+def split_paths(data: dict, key: str, root: str, exists=os.path.exists) -> list:
+    """按 ultralytics(check_det_dataset)的规则将 train/val 条目解析为路径
+
+    字符串条目不存在且以 ../ 开头时, 去掉 ../ 后相对根目录重新解析
+    (如 Roboflow 导出的 train: ../train/images); 列表条目直接相对根目录解析
+
+    Args:
+        data: dataset.yaml 的内容
+        key: "train" 或 "val"
+        root: dataset_root 返回的根目录
+        exists: 路径存在性检查, 解析存储桶中的对象名时由调用方提供
+    """
+    entry = data.get(key)
+    if not entry:
+        return []
+    if isinstance(entry, list):
+        return [os.path.normpath(os.path.join(root, str(item))) for item in entry]
+    entry = str(entry)
+    path = os.path.normpath(os.path.join(root, entry))
+    if not exists(path) and entry.startswith("../"):
+        path = os.path.normpath(os.path.join(root, entry[3:]))
+    return [path]
+
+
+def list_file_paths(list_path: str, lines: list, cwd: str) -> list:
+    """按 ultralytics 的规则解析图片列表文件(.txt)中的条目
+
+    ./ 开头的条目相对列表文件所在目录, 其他相对路径相对训练时的工作目录(数据集目录)
+
+    Args:
+        list_path: 列表文件路径
+        lines: 列表文件的各行
+        cwd: 训练时的工作目录
+    """
+    parent = os.path.dirname(list_path)
+    paths = []
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("./"):
+            paths.append(os.path.normpath(os.path.join(parent, line[2:])))
+        else:
+            paths.append(os.path.normpath(os.path.join(cwd, line)))
+    return paths
+
+
+def list_images(path: str, exclude: tuple = ()) -> list:
+    """递归列出目录中的图片, 跳过 exclude 中的目录(绝对路径)"""
+    images = []
+    for dirpath, dirs, files in os.walk(path):
+        dirs[:] = [d for d in dirs if os.path.abspath(os.path.join(dirpath, d)) not in exclude]
+        images.extend(os.path.join(dirpath, f) for f in files if is_image(f))
+    return images
+
+
+def split_images(data: dict, key: str, dataset_dir: str) -> tuple:
+    """列出本地数据集中 train/val 划分的全部图片, 返回 (图片列表, 不存在的路径列表)
+
+    Args:
+        data: dataset.yaml 的内容
+        key: "train" 或 "val"
+        dataset_dir: dataset.yaml 所在目录, 同时是训练时的工作目录
+    """
+    root, _ = dataset_root(data, dataset_dir)
+    images, missing = [], []
+    for path in split_paths(data, key, root):
+        if os.path.isdir(path):
+            images.extend(list_images(path))
+        elif os.path.isfile(path) and path.endswith(".txt"):
+            with open(path, "r") as f:
+                images.extend(list_file_paths(path, f.read().splitlines(), dataset_dir))
+        else:
+            missing.append(path)
+    return images, missing
@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 单批最大样本数与凑批的最长等待时间
+INFER_MAX_BATCH = int(os.getenv("INFER_MAX_BATCH", 8))
+INFER_MAX_LATENCY_MS = float(os.getenv("INFER_MAX_LATENCY_MS", 10))
+_LATENCY_WINDOW = 1000
+
+
+class MicroBatcher:
+    """动态微批处理: 将并发请求合并为一个batch执行
+
+    第一个请求到达后最多等待 max_latency 以凑满 max_batch;
+    推理执行期间到达的请求在下一批中立即取出, 同一模型同时只执行一个batch
+    """
+
+    def __init__(self, name: str, run_batch, max_batch: int = INFER_MAX_BATCH,
+                 max_latency_ms: float = INFER_MAX_LATENCY_MS):
+        self.name = name
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_latency = max_latency_ms / 1000
+        # 队列与后台任务在首次提交时于事件循环中创建(模型在线程中加载)
+        self._queue = None
+        self._task = None
+        self._requests = 0
+        self._batches = 0
+        self._busy_seconds = 0.0
+        self._queue_latencies = deque(maxlen=_LATENCY_WINDOW)
+
+    async def submit(self, sample: np.ndarray) -> list:
+        """提交单个样本(形状 1×C×H×W), 返回该样本对应的各输出"""
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((sample, future, time.perf_counter()))
+        return await future
+
+    async def _collect(self) -> list:
+        first = await self._queue.get()
+        if first is None:
+            # close() 放入的结束标记: 队列已空则退出, 否则继续处理剩余请求
+            return None if self._queue.empty() else await self._collect()
+        items = [first]
+        deadline = items[0][2] + self.max_latency
+        while len(items) < self.max_batch:
+            if not self._queue.empty():
+                item = self._queue.get_nowait()
+            else:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is None:
+                # 结束标记留给下一轮处理
+                self._queue.put_nowait(None)
+                break
+            items.append(item)
+        return items
+
+    async def _loop(self):
+        while True:
+            items = await self._collect()
+            if items is None:
+                return
+            started = time.perf_counter()
+            self._queue_latencies.extend(started - enqueued for _, _, enqueued in items)
+            try:
+                outputs = await asyncio.to_thread(
+                    self.run_batch, np.concatenate([sample for sample, _, _ in items])
+                )
+            except Exception as e:
+                logger.exception(f"推理失败: {self.name}")
+                for _, future, _ in items:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self._busy_seconds += time.perf_counter() - started
+            self._requests += len(items)
+            self._batches += 1
+            for i, (_, future, _) in enumerate(items):
+                if not future.done():
+                    future.set_result([output[i:i + 1] for output in outputs])
+
+    def stats(self) -> dict:
+        latencies = np.array(self._queue_latencies) * 1000 if self._queue_latencies else np.zeros(1)
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "avg_batch_size": self._requests / self._batches if self._batches else 0,
+            "throughput": self._requests / self._busy_seconds if self._busy_seconds else 0,
+            "queue_latency_p50_ms": float(np.percentile(latencies, 50)),
+            "queue_latency_p99_ms": float(np.percentile(latencies, 99)),
+            "pending": self._queue.qsize() if self._queue else 0
+        }
+
+    def close(self):
+        """处理完已排队的请求后停止后台任务, 释放对模型的引用"""
+        if self._task is not None and not self._task.done():
+            self._queue.put_nowait(None)
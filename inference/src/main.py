@@ -0,0 +1,121 @@
+from fastapi import FastAPI, UploadFile, File
+from fastapi.responses import JSONResponse
+from fastapi.middleware.cors import CORSMiddleware
+import asyncio
+import logging
+import numpy as np
+import cv2
+from backend_common.letterbox import letterbox
+from inference.src.model_cache import ModelCache, ModelNotFound, ModelStoreError
+
+app = FastAPI()
+
+# 日志配置
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+# 配置CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 按 run_id 缓存已加载的模型
+model_cache = ModelCache()
+
+
+def _preprocess(data: bytes, imgsz: int) -> tuple:
+    """解码图片并 letterbox 到 imgsz, 返回 (1×3×H×W float32, 缩放比例, (上, 左)填充)"""
+    im = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if im is None:
+        raise ValueError("图片无法解码")
+    chw, r, pad = letterbox(im, imgsz)
+    sample = np.ascontiguousarray(chw[None], dtype=np.float32) / 255.0
+    return sample, r, pad
+
+
+def _postprocess(outputs: list, r: float, pad: tuple, conf: float, iou: float):
+    """解析YOLOv8检测输出(1×(4+nc)×N)并执行NMS; 其他形状的输出原样返回"""
+    pred = outputs[0]
+    if pred.ndim != 3 or pred.shape[1] <= 4:
+        return {"outputs": [output.tolist() for output in outputs]}
+    pred = pred[0].T
+    scores = pred[:, 4:]
+    classes = scores.argmax(axis=1)
+    confidences = scores.max(axis=1)
+    keep = confidences >= conf
+    pred, classes, confidences = pred[keep], classes[keep], confidences[keep]
+
+    # xywh(中心点) -> 左上角xywh, 并还原 letterbox
+    top, left = pad
+    boxes = np.stack([
+        (pred[:, 0] - pred[:, 2] / 2 - left) / r,
+        (pred[:, 1] - pred[:, 3] / 2 - top) / r,
+        pred[:, 2] / r,
+        pred[:, 3] / r
+    ], axis=1)
+    indices = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), conf, iou)
+    return {"detections": [
+        {
+            "class": int(classes[i]),
+            "confidence": float(confidences[i]),
+            "box": [
+                float(boxes[i, 0]),
+                float(boxes[i, 1]),
+                float(boxes[i, 0] + boxes[i, 2]),
+                float(boxes[i, 1] + boxes[i, 3])
+            ]
+        }
+        for i in np.array(indices).flatten()
+    ]}
+
+
+@app.post("/api/infer/{run_id}")
+async def infer(
+    run_id: str,
+    files: list[UploadFile] = File(...),
+    variant: str = "fp32",
+    conf: float = 0.25,
+    iou: float = 0.45
+):
+    """使用训练运行导出的模型进行CPU推理, 并发请求由微批处理合并执行"""
+    try:
+        model = await model_cache.get(run_id, variant)
+    except ModelNotFound as e:
+        return JSONResponse(status_code=404, content={"error": str(e)})
+    except ModelStoreError as e:
+        return JSONResponse(status_code=502, content={"error": str(e)})
+
+    try:
+        samples = await asyncio.gather(*[
+            asyncio.to_thread(_preprocess, await file.read(), model.imgsz) for file in files
+        ])
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    outputs = await asyncio.gather(*[model.batcher.submit(sample) for sample, _, _ in samples])
+    return {
+        "run_id": run_id,
+        "variant": variant,
+        "results": [
+            {"filename": file.filename, **_postprocess(output, r, pad, conf, iou)}
+            for file, output, (_, r, pad) in zip(files, outputs, samples)
+        ]
+    }
+
+
+@app.get("/api/infer/stats")
+async def infer_stats():
+    """各模型的吞吐量、批大小与排队延迟, 以及模型缓存占用"""
+    return {
+        "cache_bytes": model_cache.nbytes,
+        "cache_capacity_bytes": model_cache.capacity_bytes,
+        "models": {model.key: model.batcher.stats() for model in model_cache.models()}
+    }
@@ -0,0 +1,168 @@
+import os
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from urllib.parse import urlparse
+import requests
+import onnxruntime as ort
+from minio.error import S3Error
+from backend_common.run_registry import get_run
+from backend_common.storage import get_minio_client
+from inference.src.batcher import MicroBatcher
+
+logger = logging.getLogger(__name__)
+
+# 模型缓存上限(字节)与本地下载目录
+INFERENCE_CACHE_BYTES = int(os.getenv("INFERENCE_CACHE_BYTES", 2 * 1024 ** 3))
+INFERENCE_MODEL_DIR = os.getenv("INFERENCE_MODEL_DIR", "/tmp/nylab-models")
+INFERENCE_THREADS = int(os.getenv("INFERENCE_THREADS", os.cpu_count() or 1))
+
+
+class ModelNotFound(Exception):
+    """运行不存在或没有可用的ONNX导出"""
+
+
+class ModelStoreError(Exception):
+    """MLflow或MinIO访问失败"""
+
+
+class LoadedModel:
+    def __init__(self, key: str, path: str, imgsz: int = None):
+        self.key = key
+        self.path = path
+        self.nbytes = os.path.getsize(path)
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = INFERENCE_THREADS
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # NCHW, 固定输入尺寸以模型为准; 动态输入(导出时 dynamic=True)使用训练时记录的尺寸
+        if isinstance(model_input.shape[2], int):
+            self.imgsz = model_input.shape[2]
+        else:
+            self.imgsz = imgsz or 640
+        self.batcher = MicroBatcher(key, self.run)
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})
+
+
+def _export_imgsz(bucket: str, prefix: str) -> int:
+    """读取导出时记录的训练输入尺寸, 缺失时返回 None
+
+    export.json 由发布步骤写入; 更早的运行只有开启基准测试时写入的 cpu_benchmark.json
+    """
+    for name in ("export.json", "cpu_benchmark.json"):
+        try:
+            response = get_minio_client().get_object(bucket, f"{prefix}{name}")
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                continue
+            raise
+        try:
+            return json.loads(response.read()).get("imgsz")
+        finally:
+            response.close()
+            response.release_conn()
+    return None
+
+
+def _resolve_onnx(run_id: str, variant: str) -> tuple:
+    """通过运行登记表与MLflow找到运行导出的ONNX对象, 返回 (桶, 对象名, 训练输入尺寸)"""
+    run = get_run(run_id)
+    if not run or not run.get("mlflow_run_id"):
+        raise ModelNotFound(f"运行不存在或尚未开始: {run_id}")
+    try:
+        response = requests.get(
+            f"{os.environ['MLFLOW_TRACKING_URI']}/api/2.0/mlflow/runs/get",
+            params={"run_id": run["mlflow_run_id"]},
+            timeout=10
+        )
+        if response.status_code == 404:
+            raise ModelNotFound(f"MLflow运行不存在: {run['mlflow_run_id']}")
+        response.raise_for_status()
+    except requests.RequestException as e:
+        raise ModelStoreError(f"MLflow访问失败: {e}") from e
+    uri = urlparse(response.json()["run"]["info"]["artifact_uri"])
+    bucket, prefix = uri.netloc, f"{uri.path.strip('/')}/export/"
+
+    try:
+        candidates = [
+            obj.object_name for obj in get_minio_client().list_objects(bucket, prefix=prefix)
+            if obj.object_name.endswith(".onnx")
+        ]
+        imgsz = _export_imgsz(bucket, prefix)
+    except S3Error as e:
+        if e.code == "NoSuchBucket":
+            raise ModelNotFound(f"运行 {run_id} 的产物不存在") from e
+        raise ModelStoreError(f"MinIO访问失败: {e}") from e
+    int8 = [name for name in candidates if name.endswith("_int8.onnx")]
+    fp32 = [name for name in candidates if not name.endswith("_int8.onnx")]
+    chosen = int8 if variant == "int8" else fp32
+    if not chosen:
+        raise ModelNotFound(f"运行 {run_id} 没有 {variant} ONNX导出, 训练结果需为 yolo 框架或提供 onnx_path")
+    return bucket, chosen[0], imgsz
+
+
+class ModelCache:
+    """按 run_id 加载模型的LRU缓存, 以模型文件大小限制总占用
+
+    仅在事件循环中访问, 不需要加锁; 下载与加载在线程中执行
+    """
+
+    def __init__(self, capacity_bytes: int = INFERENCE_CACHE_BYTES):
+        self.capacity_bytes = capacity_bytes
+        self._models = OrderedDict()
+        self._loading = {}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(model.nbytes for model in self._models.values())
+
+    def _load(self, key: str, run_id: str, variant: str) -> LoadedModel:
+        bucket, object_name, imgsz = _resolve_onnx(run_id, variant)
+        local_path = os.path.join(INFERENCE_MODEL_DIR, f"{run_id}_{variant}.onnx")
+        os.makedirs(INFERENCE_MODEL_DIR, exist_ok=True)
+        try:
+            get_minio_client().fget_object(bucket, object_name, local_path)
+        except S3Error as e:
+            raise ModelStoreError(f"模型下载失败: {e}") from e
+        model = LoadedModel(key, local_path, imgsz)
+        logger.info(f"加载模型: {key} ({model.nbytes} 字节)")
+        return model
+
+    def _evict(self) -> None:
+        # 至少保留最近使用的一个模型
+        while len(self._models) > 1 and self.nbytes > self.capacity_bytes:
+            key, model = self._models.popitem(last=False)
+            model.batcher.close()
+            try:
+                os.remove(model.path)
+            except OSError:
+                pass
+            logger.info(f"淘汰模型: {key}")
+
+    async def get(self, run_id: str, variant: str = "fp32") -> LoadedModel:
+        """获取模型, 未缓存时下载并加载; 同一模型的并发请求只加载一次"""
+        key = f"{run_id}:{variant}"
+        if key in self._models:
+            self._models.move_to_end(key)
+            return self._models[key]
+
+        loading = self._loading.get(key)
+        if loading is None:
+            loading = asyncio.ensure_future(asyncio.to_thread(self._load, key, run_id, variant))
+            self._loading[key] = loading
+            loading.add_done_callback(lambda _: self._loading.pop(key, None))
+        model = await asyncio.shield(loading)
+
+        if key not in self._models:
+            self._models[key] = model
+            self._evict()
+        self._models.move_to_end(key)
+        return model
+
+    def models(self) -> list:
+        return list(self._models.values())
@@ -0,0 +1,149 @@
+import os
+from pathlib import Path
+import cv2
+import torch
+import torchvision
+from backend_common.letterbox import letterbox
+from backend_common.yolo_dataset import list_images
+from worker.src.utils.ddp import (
+    wrap_model,
+    unwrap_model,
+    sum_across_ranks,
+    min_across_ranks,
+    union_across_ranks
+)
+
+# 数据集要求声明, 提交时由预检静态读取(不执行脚本)
+# 目录结构: train/<类别>/*.jpg, val/<类别>/*.jpg
+NYLAB_DATASET = {"format": "imagefolder", "required": ["train", "val"]}
+
+
+class FolderDataset(torch.utils.data.Dataset):
+    """按父目录名作为类别的图片数据集, 预处理与推理服务一致(letterbox, 缩放到[0,1])"""
+
+    def __init__(self, root, classes, imgsz):
+        self.samples = [
+            (path, classes.index(Path(path).parent.name))
+            for path in sorted(list_images(root))
+            if Path(path).parent.name in classes
+        ]
+        self.imgsz = imgsz
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        path, label = self.samples[index]
+        im = cv2.imread(path)
+        if im is None:
+            raise ValueError(f"图片无法解码: {path}")
+        chw = letterbox(im, self.imgsz)[0]
+        return torch.from_numpy(chw.copy()).float() / 255.0, label
+
+
+def _class_names(root):
+    return [entry.name for entry in os.scandir(root) if entry.is_dir()] if os.path.isdir(root) else []
+
+
+def nylab_train(
+    dataset_path,
+    run_id,
+    update_progress,
+    distributed=None,
+    cpu_budget=None,
+    epochs=10,
+    batch=32,
+    imgsz=224,
+    lr0=0.01,
+    **hyperparams
+):
+    """
+    图片分类训练函数, 支持多worker数据并行(world_size > 1)
+
+    参数:
+    - dataset_path: 数据集路径 (包含 train/ 与 val/)
+    - run_id: 训练运行唯一ID
+    - update_progress: 进度回调函数 (run_id, progress, message)
+    - distributed: 分布式训练信息 {"rank", "world_size", "backend"}, 单worker训练时为空;
+        每个rank只有自己的数据分片(验证集同样分片), 梯度由 DistributedDataParallel 同步,
+        验证指标按各rank的计数求和得到完整验证集上的结果
+    - cpu_budget: worker分配的CPU配额(核心数、线程数、建议的 dataloader workers)
+    - epochs / batch / imgsz / lr0: 训练轮数、每个rank的batch大小、输入尺寸、初始学习率
+    - hyperparams: 其他超参数(未使用)
+    """
+    rank = distributed["rank"] if distributed else 0
+    train_dir = os.path.join(dataset_path, "train")
+    val_dir = os.path.join(dataset_path, "val")
+
+    # 分片后某些类别可能只出现在部分rank上, 类别列表取各rank的并集以保证编号一致
+    classes = union_across_ranks(_class_names(train_dir) + _class_names(val_dir), distributed)
+    workers = cpu_budget["dataloader_workers"] if cpu_budget else 0
+    train_loader = torch.utils.data.DataLoader(
+        FolderDataset(train_dir, classes, imgsz), batch_size=batch, shuffle=True, num_workers=workers
+    )
+    val_loader = torch.utils.data.DataLoader(
+        FolderDataset(val_dir, classes, imgsz), batch_size=batch, num_workers=workers
+    )
+    # 各rank的训练步数必须相同, 否则步数多的rank会在梯度同步处一直等待
+    steps = min_across_ranks(len(train_loader), distributed)
+
+    update_progress(run_id, 30, f"构建模型: {len(classes)} 个类别")
+    model = wrap_model(torchvision.models.resnet18(num_classes=len(classes)), distributed)
+    optimizer = torch.optim.SGD(model.parameters(), lr=lr0, momentum=0.9, weight_decay=5e-4)
+    scheduler = torch.optim.lr_scheduler.CosineAnnealingLR(optimizer, max(epochs, 1))
+    criterion = torch.nn.CrossEntropyLoss()
+
+    update_progress(run_id, 35, "开始训练")
+    for epoch in range(epochs):
+        model.train()
+        totals = {"loss": 0.0, "batches": 0}
+        for _, (images, labels) in zip(range(steps), train_loader):
+            optimizer.zero_grad()
+            loss = criterion(model(images), labels)
+            loss.backward()
+            optimizer.step()
+            totals["loss"] += loss.item()
+            totals["batches"] += 1
+        scheduler.step()
+        totals = sum_across_ranks(totals, distributed)
+        # 每个epoch结束时上报进度(35%~80%), 同时作为取消检查点; 各rank在同一位置检查
+        progress = 35 + int(45 * (epoch + 1) / epochs)
+        update_progress(
+            run_id, progress,
+            f"训练中: epoch {epoch + 1}/{epochs}, loss {totals['loss'] / max(totals['batches'], 1):.4f}"
+        )
+
+    # 验证: 各rank在自己的分片上计数, 求和后计算完整验证集的准确率
+    update_progress(run_id, 85, "模型验证中")
+    net = unwrap_model(model)
+    net.eval()
+    counts = {"correct": 0, "total": 0}
+    with torch.no_grad():
+        for images, labels in val_loader:
+            counts["correct"] += (net(images).argmax(dim=1) == labels).sum().item()
+            counts["total"] += len(labels)
+    counts = sum_across_ranks(counts, distributed)
+    accuracy = counts["correct"] / max(counts["total"], 1)
+
+    result = {
+        'metrics': {'val_accuracy': accuracy, 'val_samples': counts["total"]},
+        'accuracy': accuracy,
+        'framework': 'torch',
+        'classes': classes
+    }
+    if rank != 0:
+        return result
+
+    # 只有rank 0保存模型; 导出动态batch的ONNX供推理服务加载(输入为letterbox后的RGB图片)
+    model_dir = Path(dataset_path).parent / "models"
+    model_dir.mkdir(parents=True, exist_ok=True)
+    model_path = model_dir / f"classifier_{run_id}.pt"
+    torch.save({"state_dict": net.state_dict(), "classes": classes, "imgsz": imgsz}, model_path)
+    onnx_path = model_dir / f"classifier_{run_id}.onnx"
+    torch.onnx.export(
+        net, torch.zeros(1, 3, imgsz, imgsz), onnx_path,
+        input_names=["images"], output_names=["logits"],
+        dynamic_axes={"images": {0: "batch"}, "logits": {0: "batch"}}
+    )
+    result.update({'model_path': str(model_path), 'onnx_path': str(onnx_path)})
+    return result
@@ -1,9 +1,13 @@
 import os
+from contextlib import nullcontext
 from pathlib import Path
 from ultralytics import YOLO
 import mlflow
 
-def nylab_train(dataset_path, run_id, update_progress, **hyperparams):
+# 数据集要求声明, 提交时由预检静态读取(不执行脚本)
+NYLAB_DATASET = {"format": "yolo", "required": ["dataset.yaml"]}
+
+def nylab_train(dataset_path, run_id, update_progress, cpu_budget=None, profile_step=None, **hyperparams):
     """
     YOLOv8 通用训练函数
     
@@ -11,7 +15,10 @@ def nylab_train(dataset_path, run_id, update_progress, **hyperparams):
     - dataset_path: 数据集路径 (包含 dataset.yaml)
     - run_id: 训练运行唯一ID
     - update_progress: 进度回调函数 (run_id, progress, message)
+    - cpu_budget: worker分配的CPU配额(核心数、线程数、建议的 dataloader workers)
+    - profile_step: 开启 torch profiler 时的单步回调, 每个训练batch结束时调用
     - hyperparams: 训练超参数字典
+        额外支持 nylab_image_cache=True: 使用节点级预处理图片缓存(按数据集哈希与 imgsz 复用)
     
     支持的完整超参数列表:
     https://docs.ultralytics.com/usage/cfg/#training-arguments
@@ -67,8 +74,23 @@ def nylab_train(dataset_path, run_id, update_progress, **hyperparams):
         'mask_ratio': 4,
     }
     
+    # 非 ultralytics 参数, 需在传给 model.train 前取出
+    use_image_cache = hyperparams.pop('nylab_image_cache', False)
+
+    # 未显式指定 workers 时使用worker分配的 dataloader 进程数
+    if cpu_budget and 'workers' not in hyperparams:
+        cfg['workers'] = cpu_budget['dataloader_workers']
+
     # 使用传入的超参数覆盖默认值
     cfg.update(hyperparams)
+
+    # 预处理图片缓存: 每个 (数据集, imgsz) 只解码缩放一次, 多次训练共享
+    cache_hook = nullcontext()
+    if use_image_cache:
+        from worker.src.utils.image_cache import build_image_cache, ultralytics_cache_hook
+        update_progress(run_id, 27, "构建预处理图片缓存")
+        image_cache = build_image_cache(dataset_path, cfg['imgsz'])
+        cache_hook = ultralytics_cache_hook(image_cache, dataset_path)
     
     # 记录使用的参数
     mlflow.log_params(cfg)
@@ -76,10 +98,19 @@ def nylab_train(dataset_path, run_id, update_progress, **hyperparams):
     # 初始化模型
     update_progress(run_id, 30, f"加载模型: {cfg['model']}")
     model = YOLO(cfg['model'])
+
+    # 每个epoch结束时上报进度(35%~80%), 同时作为取消检查点
+    def on_train_epoch_end(trainer):
+        progress = 35 + int(45 * (trainer.epoch + 1) / trainer.epochs)
+        update_progress(run_id, progress, f"训练中: epoch {trainer.epoch + 1}/{trainer.epochs}")
+    model.add_callback("on_train_epoch_end", on_train_epoch_end)
+    if profile_step is not None:
+        model.add_callback("on_train_batch_end", lambda trainer: profile_step())
     
     # 开始训练
     update_progress(run_id, 35, "开始训练")
-    results = model.train(**cfg)
+    with cache_hook:
+        results = model.train(**cfg)
     
     # 创建模型保存目录
     model_dir = Path(dataset_path).parent / "models"
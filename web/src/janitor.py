@@ -0,0 +1,112 @@
+import os
+import time
+import shutil
+import asyncio
+import logging
+import redis
+from celery import states
+from backend_common.run_registry import REDIS_POOL, get_runs, update_run
+from backend_common.space_manager import DATA_ROOT, release, reservations
+
+logger = logging.getLogger(__name__)
+
+# 清理周期
+JANITOR_INTERVAL = float(os.getenv("JANITOR_INTERVAL", 600))
+# 无运行记录的目录超过该时长才视为遗留(web在登记前仍在暂存数据)
+JANITOR_ORPHAN_GRACE = float(os.getenv("JANITOR_ORPHAN_GRACE", 3600))
+# 已结束的运行留给worker完成 finally(上传性能数据、删除目录)的时间
+JANITOR_FINISHED_GRACE = float(os.getenv("JANITOR_FINISHED_GRACE", 600))
+_TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+
+def _task_finished(celery_app, run: dict) -> bool:
+    """运行的全部Celery任务都已结束(成功、失败或被撤销)"""
+    task_ids = run.get("task_ids") or [run.get("task_id")]
+    return all(
+        task_id and celery_app.AsyncResult(task_id).state in states.READY_STATES
+        for task_id in task_ids
+    )
+
+
+def _modified_since(path: str, since: float) -> bool:
+    """目录树中是否有在 since 之后修改的条目
+
+    暂存时文件写入 datasets/ 等子目录, 顶层目录的修改时间不变, 需要检查整个目录树
+    """
+    if os.stat(path, follow_symlinks=False).st_mtime > since:
+        return True
+    for dirpath, dirs, files in os.walk(path):
+        for name in dirs + files:
+            try:
+                if os.stat(os.path.join(dirpath, name), follow_symlinks=False).st_mtime > since:
+                    return True
+            except FileNotFoundError:
+                continue
+    return False
+
+
+def _is_orphan(celery_app, run: dict, path: str, now: float) -> bool:
+    if run["state"] == "unknown":
+        return not _modified_since(path, now - JANITOR_ORPHAN_GRACE)
+    if run["state"] in _TERMINAL_STATES:
+        return now - (run.get("finished_at") or 0) > JANITOR_FINISHED_GRACE
+    # 运行记录未结束但任务已结束: worker被强制终止, finally 与撤销回调都没有执行
+    return _task_finished(celery_app, run)
+
+
+def sweep(celery_app) -> dict:
+    """清理 DATA_ROOT 下遗留的运行目录, 并释放已不存在的运行的空间预留
+
+    以 "." 开头的目录(如图片缓存 .cache)不属于任何运行, 不做处理
+    """
+    now = time.time()
+    entries = [
+        entry for entry in os.scandir(DATA_ROOT)
+        if entry.is_dir(follow_symlinks=False) and not entry.name.startswith(".")
+    ]
+    runs = dict(zip(
+        [entry.name for entry in entries],
+        get_runs([entry.name for entry in entries], include_progress=False)
+    ))
+
+    removed = []
+    for entry in entries:
+        run = runs[entry.name]
+        if not _is_orphan(celery_app, run, entry.path, now):
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+        release(entry.name)
+        removed.append(entry.name)
+        if run["state"] not in _TERMINAL_STATES + ("unknown",):
+            update_run(run["run_id"], "failed", finished_at=now, error="训练任务已终止, 运行目录已被清理")
+        logger.info(f"已清理遗留运行目录: {entry.path}")
+
+    # 目录已不存在的运行不再占用空间(如web暂存失败或worker已清理但未释放)
+    present = {entry.name for entry in entries}
+    pending = {run_id: r for run_id, r in reservations().items() if run_id not in present}
+    released = []
+    for run in get_runs(list(pending), include_progress=False):
+        run_id = run["run_id"]
+        if run["state"] == "unknown":
+            # 尚未登记: web可能仍在暂存
+            if now - pending[run_id]["reserved_at"] <= JANITOR_ORPHAN_GRACE:
+                continue
+        elif run["state"] not in _TERMINAL_STATES and not _task_finished(celery_app, run):
+            continue
+        release(run_id)
+        released.append(run_id)
+    return {"removed": removed, "released": released}
+
+
+async def janitor_loop(celery_app) -> None:
+    """周期性执行 sweep; 多个web实例时通过Redis锁保证同一周期只有一个实例清理"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    while True:
+        try:
+            if r.set("lock:janitor", "1", nx=True, ex=int(JANITOR_INTERVAL)):
+                result = await asyncio.to_thread(sweep, celery_app)
+                if result["removed"] or result["released"]:
+                    logger.info(f"磁盘清理完成: {result}")
+        except Exception as e:
+            logger.warning(f"磁盘清理失败: {e}")
+        await asyncio.sleep(JANITOR_INTERVAL)
@@ -1,10 +1,13 @@
 from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from minio import Minio
 from minio.error import S3Error
-from pydantic import ValidationError
+from celery import states
+from pydantic import BaseModel, ValidationError
 import os
+import time
+import shutil
+import asyncio
 import logging
 import uuid
 import json
@@ -12,18 +15,21 @@ from typing import Optional
 from backend_common.celery_setup import create_celery_app
 from backend_common.TrainingConfig import TrainingConfig
 from backend_common.encoder import _hash_password
+from backend_common.storage import AsyncStorage
+from web.src.preflight import check_script, run_preflight
+from backend_common.run_registry import register_run, list_runs, get_runs, get_run, update_run
+from backend_common.cancellation import request_cancel
+from backend_common.duration_model import run_features, record_phase, estimate_queue
+from backend_common.gang import reserve_gang, release_gang
+from backend_common.space_manager import try_reserve, mark_staged, release, volume_usage, STREAM_CACHE_BYTES
+from web.src.janitor import janitor_loop
 
 app = FastAPI()
 # 创建一个不包含任务模块的Celery应用, 仅用来发送任务信息
 celery_app = create_celery_app(include_tasks=False)
 
-# MinIO客户端创建
-minio_client = Minio(
-    endpoint=os.getenv("MINIO_ENDPOINT", "minio:9000"),
-    access_key=os.environ["AWS_ACCESS_KEY_ID"],
-    secret_key=os.environ["AWS_SECRET_ACCESS_KEY"],
-    secure=False
-)
+# MinIO异步存储接口, 阻塞调用在独立线程池中执行, 不占用事件循环
+storage = AsyncStorage()
 
 # 日志配置
 logging.basicConfig(
@@ -33,6 +39,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 磁盘超过水位线时, 提交请求最多等待该时长以等待空间释放, 为0时立即拒绝
+DISK_ADMISSION_WAIT = float(os.getenv("DISK_ADMISSION_WAIT", 0))
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,6 +52,43 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+async def start_janitor():
+    """启动共享数据卷的周期清理"""
+    asyncio.create_task(janitor_loop(celery_app))
+
+
+async def _admit(run_id: str, dataset_bytes: int):
+    """为运行预留磁盘空间, 空间不足时按 DISK_ADMISSION_WAIT 等待, 仍不足则返回507响应"""
+    deadline = time.monotonic() + DISK_ADMISSION_WAIT
+    contended = 0
+    while True:
+        admitted, usage = await asyncio.to_thread(try_reserve, run_id, dataset_bytes)
+        if admitted:
+            return None
+        if usage is None:
+            # 取锁超时: 并发提交较多, 与空间是否充足无关, 短暂等待后重试
+            contended += 1
+            if contended > 10:
+                return JSONResponse(status_code=503, content={"error": "提交过于频繁, 请稍后重试"})
+            await asyncio.sleep(0.5)
+            continue
+        if time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(min(5, max(deadline - time.monotonic(), 0)))
+    logger.error(f"磁盘空间不足, 拒绝运行: {run_id}, 当前占用: {usage['projected_ratio']:.1%}")
+    return JSONResponse(
+        status_code=507,
+        content={"error": "共享数据卷空间不足, 请稍后重试", "storage": usage}
+    )
+
+
+def _discard_staging(run_id: str) -> None:
+    """提交失败时删除暂存目录并释放空间预留"""
+    shutil.rmtree(f"/data/{run_id}", ignore_errors=True)
+    release(run_id)
+
+
 @app.post("/api/train")
 async def start_training_task(
     request: Request,
@@ -69,19 +115,76 @@ async def start_training_task(
         return JSONResponse(status_code=400, content={"error": f"配置验证失败: {e}"})
 
     logger.info(f"传入配置: {task_config}")
+    world_size = task_config.world_size or 1
+    if world_size < 1:
+        return JSONResponse(status_code=400, content={"error": "world_size 必须大于等于1"})
+    if task_config.stream_dataset and (task_config.use_local_dataset or world_size > 1):
+        return JSONResponse(status_code=400, content={"error": "流式数据集仅支持云存储数据集的单worker训练"})
     
     # 生成唯一运行ID
     run_id = str(uuid.uuid4())
+    staging_started = time.monotonic()
     
     # 创建数据集目录（以run_id命名）, 使用临时目录
     tmp_dir = f"/data/{run_id}" # 暂时使用, 在训练结束时清理
     dataset_dir = os.path.join(tmp_dir, "datasets")
+    # 流式数据集不落盘, 运行特征按存储桶列举结果统计 (字节数, 文件数)
+    stream_size = None
     script_dir = tmp_dir
     os.makedirs(dataset_dir, exist_ok=True)
     os.makedirs(script_dir, exist_ok=True)
 
+    # 保存本地上传的脚本文件
+    if task_config.use_local_script:
+        if not script_file:
+            _discard_staging(run_id)
+            return JSONResponse(status_code=400, content={"error": "未上传训练脚本"})
+        script_path = os.path.join(script_dir, script_file.filename)
+        os.makedirs(os.path.dirname(script_path), exist_ok=True)
+        with open(script_path, "wb") as buffer:
+            buffer.write(await script_file.read())
+    # 保存存储桶中的脚本文件
+    else:
+        script_path = os.path.join(script_dir, os.path.basename(task_config.db_script_name))
+        try:
+            await storage.fget_object(
+                "training-scripts",
+                task_config.db_script_name,
+                script_path
+            )
+        except S3Error as e:
+            logger.error(f"下载脚本失败: {e}")
+            _discard_staging(run_id)
+            return JSONResponse(status_code=500, content={"error": f"脚本下载失败: {e.message}"})
+
+    # 先静态检查脚本: 缺少入口等错误在下载数据集之前即被拒绝
+    started = time.monotonic()
+    script_errors, expectations = await asyncio.to_thread(
+        check_script,
+        script_path,
+        world_size,
+        task_config.stream_dataset,
+        task_config.hyperparams
+    )
+    if script_errors:
+        logger.error(f"预检失败: {script_errors}")
+        _discard_staging(run_id)
+        report = {
+            "ok": False,
+            "errors": script_errors,
+            "warnings": [],
+            "checked": {},
+            "elapsed": time.monotonic() - started
+        }
+        return JSONResponse(status_code=422, content={"error": "预检失败", "preflight": report})
+
     # 保存所有本地上传的数据集
     if task_config.use_local_dataset:
+        # 请求体大小即为数据集大小的上界
+        rejected = await _admit(run_id, int(request.headers.get("content-length", 0)))
+        if rejected:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return rejected
         for file in files:
             file_path = os.path.join(dataset_dir, file.filename)
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
@@ -90,10 +193,7 @@ async def start_training_task(
     # 保存指定存储桶中的数据集
     else:
         # 尝试获取桶的元数据文件
-        response = minio_client.get_object(task_config.db_dataset_bucket_name, ".bucket_meta")
-        meta_content = response.data.decode()
-        response.close()
-        response.release_conn()
+        meta_content = (await storage.get_object_bytes(task_config.db_dataset_bucket_name, ".bucket_meta")).decode()
         
         # 解析元数据中的密码
         stored_pwd = None
@@ -105,98 +205,231 @@ async def start_training_task(
         if stored_pwd and stored_pwd == _hash_password(task_config.db_dataset_bucket_pwd):
                 logger.info(f"存储桶密码验证成功")
 
-                # 检查是文件还是文件夹
-                try:
-                    # 尝试作为文件下载
-                    minio_client.fget_object(
-                        task_config.db_dataset_bucket_name,
-                        task_config.db_dataset_name,
-                        os.path.join(dataset_dir, os.path.basename(task_config.db_dataset_name))
-                    )
-                    logger.info(f"已下载数据集文件: {task_config.db_dataset_name}")
-                except S3Error as e:
-                    if e.code == 'NoSuchKey':
-                        # 作为文件夹处理
-                        prefix = task_config.db_dataset_name
-                        if not prefix.endswith('/'):
-                            prefix += '/'
-
-                        objects = minio_client.list_objects(
+                # 数据集为单个文件或文件夹, 以其全部对象的大小作为预计占用
+                dataset_objects = await _dataset_objects(
+                    task_config.db_dataset_bucket_name,
+                    task_config.db_dataset_name
+                )
+                dataset_bytes = sum(obj.size or 0 for obj in dataset_objects)
+                if task_config.stream_dataset:
+                    stream_size = (dataset_bytes, sum(1 for obj in dataset_objects if not obj.is_dir))
+                    # 流式读取只在worker本地保留有界的块缓存
+                    dataset_bytes = STREAM_CACHE_BYTES
+                rejected = await _admit(run_id, dataset_bytes)
+                if rejected:
+                    shutil.rmtree(tmp_dir, ignore_errors=True)
+                    return rejected
+
+                if task_config.stream_dataset:
+                    logger.info(f"流式数据集模式, 训练时直接读取: {task_config.db_dataset_name}")
+                else:
+                    # 检查是文件还是文件夹
+                    try:
+                        # 尝试作为文件下载
+                        await storage.fget_object(
                             task_config.db_dataset_bucket_name,
-                            prefix=prefix,
-                            recursive=True
+                            task_config.db_dataset_name,
+                            os.path.join(dataset_dir, os.path.basename(task_config.db_dataset_name))
                         )
+                        logger.info(f"已下载数据集文件: {task_config.db_dataset_name}")
+                    except S3Error as e:
+                        if e.code == 'NoSuchKey':
+                            # 作为文件夹处理
+                            prefix = task_config.db_dataset_name
+                            if not prefix.endswith('/'):
+                                prefix += '/'
 
-                        # 下载所有对象
-                        total_files = 0
-                        for obj in objects:
-                            total_files += 1
-                            relative_path = obj.object_name[len(prefix):]
-                            local_path = os.path.join(dataset_dir, relative_path)
-                            os.makedirs(os.path.dirname(local_path), exist_ok=True)
-
-                            minio_client.fget_object(
+                            objects = await storage.list_objects(
                                 task_config.db_dataset_bucket_name,
-                                obj.object_name,
-                                local_path
+                                prefix=prefix,
+                                recursive=True
+                            )
+
+                            # 并发下载所有对象, 并发度受存储线程池与连接池限制
+                            downloads = []
+                            for obj in objects:
+                                relative_path = obj.object_name[len(prefix):]
+                                local_path = os.path.join(dataset_dir, relative_path)
+                                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                                downloads.append(storage.fget_object(
+                                    task_config.db_dataset_bucket_name,
+                                    obj.object_name,
+                                    local_path
+                                ))
+                            await asyncio.gather(*downloads)
+                            total_files = len(downloads)
+                            logger.info(f"已下载数据集文件夹: {task_config.db_dataset_name}，包含 {total_files} 个文件")
+                        else:
+                            logger.error(f"MinIO操作失败: {str(e)}")
+                            _discard_staging(run_id)
+                            return JSONResponse(
+                                status_code=500,
+                                content={"error": f"数据集访问失败: {e.message}"}
                             )
-                        logger.info(f"已下载数据集文件夹: {task_config.db_dataset_name}，包含 {total_files} 个文件")
-                    else:
-                        logger.error(f"MinIO操作失败: {str(e)}")
-                        return JSONResponse(
-                            status_code=500,
-                            content={"error": f"数据集访问失败: {e.message}"}
-                        )
         else:
                 logger.error("存储桶密码验证失败")
+                shutil.rmtree(tmp_dir, ignore_errors=True)
                 return JSONResponse(
                     status_code=403,
                     content={"error": "存储桶密码错误"}
                 )
     
-    # 保存本地上传的脚本文件
-    if task_config.use_local_script:
-        if script_file:
-            script_path = os.path.join(script_dir, script_file.filename)
-            os.makedirs(os.path.dirname(script_path), exist_ok=True)
-            with open(script_path, "wb") as buffer:
-                buffer.write(await script_file.read())
-    # 保存存储桶中的脚本文件
-    else:
-        script_path = os.path.join(script_dir, os.path.basename(task_config.db_script_name))
-        try:
-            minio_client.fget_object(
-                "training-scripts",
-                task_config.db_script_name,
-                script_path
-            )
-        except S3Error as e:
-            logger.error(f"下载脚本失败: {e}")
-            return JSONResponse(status_code=500, content={"error": f"脚本下载失败: {e.message}"})
+    # 预检数据集, 必然失败的运行在排队前即被拒绝
+    report = await asyncio.to_thread(
+        run_preflight,
+        dataset_dir,
+        script_path,
+        world_size,
+        task_config.stream_dataset,
+        task_config.hyperparams,
+        expectations
+    )
+    if not report["ok"]:
+        logger.error(f"预检失败: {report['errors']}")
+        _discard_staging(run_id)
+        return JSONResponse(status_code=422, content={"error": "预检失败", "preflight": report})
+
+    # 数据集已落盘, 预留中只保留训练输出部分
+    mark_staged(run_id, await asyncio.to_thread(_dir_bytes, tmp_dir))
+
+    # 记录暂存耗时与运行特征, 用于排队时间与运行时长预测
+    features = None
+    try:
+        features = await asyncio.to_thread(
+            run_features, dataset_dir, script_path, task_config.hyperparams, stream_size
+        )
+        # 流式数据集没有暂存阶段, record_phase 按工作量为0跳过
+        record_phase(features, "staging", time.monotonic() - staging_started)
+    except Exception as e:
+        logger.warning(f"运行特征统计失败: {e}")
     # ================================================= #
 
     # *发送训练任务*
+    # 任务ID预先生成, 先登记运行记录再发送任务: worker可能在发送返回前就开始执行,
+    # 此时 update_run 与运行特征读取都依赖已存在的登记记录
+    if world_size > 1:
+        # 训练组的rank在就位前各占一个槽位, 槽位不足以容纳整个训练组时拒绝, 避免互相等待
+        slots = await asyncio.to_thread(_queue_slots, "celery")
+        if world_size > slots:
+            _discard_staging(run_id)
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"world_size({world_size}) 超过worker槽位总数({slots})"}
+            )
+        reserved, used = await asyncio.to_thread(reserve_gang, run_id, world_size, slots)
+        if not reserved:
+            _discard_staging(run_id)
+            return JSONResponse(
+                status_code=503,
+                content={"error": f"其他分布式训练占用 {'?' if used is None else used}/{slots} 个槽位, 请稍后重试"}
+            )
+
+    task_ids = [str(uuid.uuid4()) for _ in range(world_size)]
+    task_id = task_ids[0]
     try:
-        # 传递数据集目录路径（而不是单个文件路径）
-        task = celery_app.send_task(
-            "worker.src.tasks.train_task.train_task",
-            kwargs={
-                "dataset_path": dataset_dir,
-                "script_path": script_path,
-                "run_id": run_id,
-                "task_config": task_config.dict()
-            }
+        register_run(
+            run_id,
+            task_id,
+            task_config.dict(),
+            features=features,
+            task_ids=task_ids if world_size > 1 else None
         )
+    except Exception as e:
+        # 未登记的运行在janitor看来是遗留目录, 训练中途会被清理, 不能发送未登记的任务
+        logger.error(f"运行登记失败: {e}")
+        if world_size > 1:
+            release_gang(run_id)
+        _discard_staging(run_id)
+        return JSONResponse(status_code=500, content={"error": f"运行登记失败: {e}"})
+
+    sent = []
+    try:
+        if world_size > 1:
+            # 分布式训练: 各rank可能位于不同节点, 数据集经暂存桶分发, 每个rank只下载自己的分片
+            await _stage_distributed(run_id, dataset_dir, script_path)
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            for rank in range(world_size):
+                celery_app.send_task(
+                    "worker.src.tasks.distributed_task.distributed_train_task",
+                    kwargs={
+                        "run_id": run_id,
+                        "rank": rank,
+                        "world_size": world_size,
+                        "task_config": task_config.dict()
+                    },
+                    task_id=task_ids[rank]
+                )
+                sent.append(task_ids[rank])
+        else:
+            # 传递数据集目录路径（而不是单个文件路径）
+            celery_app.send_task(
+                "worker.src.tasks.train_task.train_task",
+                kwargs={
+                    "dataset_path": dataset_dir,
+                    "script_path": script_path,
+                    "run_id": run_id,
+                    "task_config": task_config.dict()
+                },
+                task_id=task_id
+            )
     except Exception as e:
         logger.error(f"任务启动失败: {e}")
+        if sent:
+            # 部分rank已发送: 撤销, 避免其占用槽位等待永远不会就位的rank
+            celery_app.control.revoke(sent)
+        update_run(run_id, "failed", finished_at=time.time(), error=f"任务启动失败: {e}")
+        release_gang(run_id)
+        _discard_staging(run_id)
         return JSONResponse(status_code=500, content={"error": f"任务启动失败: {e}"})
-    
+
     return {
         "status": "training_started",
         "run_id": run_id,
-        "task_id": task.id
+        "task_id": task_id,
+        "preflight_warnings": report["warnings"]
     }
 
+async def _dataset_objects(bucket: str, name: str) -> list:
+    """列出数据集的全部对象: 文件夹 name/ 下的对象, 或名为 name 的单个对象
+
+    不能直接按前缀 name 列举, 否则数据集 coco 会同时包含 coco128/ 下的对象
+    """
+    name = name.rstrip("/")
+    objects = await storage.list_objects(bucket, prefix=f"{name}/", recursive=True)
+    if objects:
+        return objects
+    return [obj for obj in await storage.list_objects(bucket, prefix=name) if obj.object_name == name]
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, filename))
+        for root, _, filenames in os.walk(path)
+        for filename in filenames
+    )
+
+
+async def _stage_distributed(run_id: str, dataset_dir: str, script_path: str) -> None:
+    """将暂存的数据集与脚本并发上传到分布式暂存桶 {run_id}/datasets/ 与 {run_id}/script/"""
+    bucket = "distributed-staging"
+    if not await storage.bucket_exists(bucket):
+        await storage.run(storage.client.make_bucket, bucket)
+    uploads = [storage.fput_object(bucket, f"{run_id}/script/{os.path.basename(script_path)}", script_path)]
+    for root, _, filenames in os.walk(dataset_dir):
+        for filename in filenames:
+            local_path = os.path.join(root, filename)
+            rel_path = os.path.relpath(local_path, dataset_dir).replace(os.sep, "/")
+            uploads.append(storage.fput_object(bucket, f"{run_id}/datasets/{rel_path}", local_path))
+    await asyncio.gather(*uploads)
+
+
+def _remove_distributed_staging(run_id: str) -> None:
+    """删除分布式暂存桶中本次运行的数据"""
+    bucket = "distributed-staging"
+    for obj in storage.client.list_objects(bucket, prefix=f"{run_id}/", recursive=True):
+        storage.client.remove_object(bucket, obj.object_name)
+
+
 @app.get("/api/progress/{run_id}")
 async def get_progress(run_id: str):
     # 在实际应用中，这里应该从Redis或数据库中获取进度
@@ -206,4 +439,144 @@ async def get_progress(run_id: str):
         "progress": 50,  # 实际应从任务状态获取
         "status": "running",
         "accuracy": None
-    }
\ No newline at end of file
+    }
+
+
+class RunStatusQuery(BaseModel):
+    run_ids: list[str]
+
+
+@app.get("/api/runs")
+def get_run_list(
+    offset: int = 0,
+    limit: int = 50,
+    state: Optional[str] = None,
+    train_name: Optional[str] = None
+):
+    """分页列出运行记录, 支持按状态与训练名称过滤"""
+    limit = max(1, min(limit, 500))
+    return list_runs(max(0, offset), limit, state=state, train_name=train_name)
+
+
+@app.post("/api/runs/status")
+def get_run_status(query: RunStatusQuery):
+    """批量查询运行状态, 一次 Redis 管道往返取回全部记录与实时进度"""
+    if len(query.run_ids) > 1000:
+        return JSONResponse(status_code=400, content={"error": "单次最多查询1000个运行"})
+    return {"runs": get_runs(query.run_ids)}
+
+
+@app.post("/api/runs/{run_id}/cancel")
+def cancel_run(run_id: str):
+    """取消训练运行
+
+    排队中的任务直接撤销并清理 /data/{run_id}; 运行中的任务设置取消标记,
+    由训练进程在下一次进度上报时退出, 超过宽限期仍未退出则由worker强制终止
+    """
+    run = get_run(run_id)
+    if run is None:
+        return JSONResponse(status_code=404, content={"error": f"运行不存在: {run_id}"})
+    if run["state"] in ("succeeded", "failed", "cancelled"):
+        return JSONResponse(status_code=409, content={"error": f"运行已结束: {run['state']}"})
+
+    request_cancel(run_id)
+    # 撤销消息: 尚未开始的任务被worker丢弃, 并阻止 acks_late 重新投递
+    task_ids = run.get("task_ids") or [run["task_id"]]
+    celery_app.control.revoke(task_ids)
+
+    # 登记表中的 queued 可能落后于实际状态, 以Celery任务状态确认尚未开始执行后才清理
+    not_started = [
+        celery_app.AsyncResult(task_id).state in (states.PENDING, states.RECEIVED)
+        for task_id in task_ids
+    ]
+    if run["state"] == "queued" and len(task_ids) > 1 and not_started[0]:
+        # 分布式训练的运行状态与清理都由rank 0负责: rank 0 被撤销后不会执行,
+        # 已开始的其他rank在就位等待中响应取消标记退出, 不写运行状态
+        update_run(run_id, "cancelled", finished_at=time.time())
+        release_gang(run_id)
+        # web端暂存目录在发送前已删除, 各rank的本地目录由其自身清理
+        release(run_id)
+        try:
+            _remove_distributed_staging(run_id)
+        except Exception as e:
+            logger.warning(f"清理分布式暂存数据失败: {e}")
+        return {"run_id": run_id, "status": "cancelled"}
+    if run["state"] == "queued" and all(not_started):
+        update_run(run_id, "cancelled", finished_at=time.time())
+        _discard_staging(run_id)
+        return {"run_id": run_id, "status": "cancelled"}
+    return {"run_id": run_id, "status": "cancelling"}
+
+
+def _worker_slots() -> dict:
+    """统计各队列的worker槽位数, 无法获取时回退到 CELERY_CONCURRENCY"""
+    inspector = celery_app.control.inspect(timeout=1.0)
+    stats = inspector.stats() or {}
+    active_queues = inspector.active_queues() or {}
+    slots = {}
+    for worker, worker_stats in stats.items():
+        concurrency = worker_stats.get("pool", {}).get("max-concurrency", 1)
+        for queue in active_queues.get(worker, [{"name": "celery"}]):
+            slots[queue["name"]] = slots.get(queue["name"], 0) + concurrency
+    return slots
+
+
+def _queue_slots(queue: str) -> int:
+    """队列的worker槽位数, 无法获取时回退到 CELERY_CONCURRENCY"""
+    try:
+        slots = _worker_slots()
+    except Exception as e:
+        logger.warning(f"获取worker信息失败: {e}")
+        slots = {}
+    return slots.get(queue) or int(os.getenv("CELERY_CONCURRENCY", 4))
+
+
+@app.get("/api/queues/eta")
+def get_queue_eta():
+    """各队列的排队ETA与积压(worker小时), 供扩缩容决策使用"""
+    try:
+        slots = _worker_slots()
+    except Exception as e:
+        logger.warning(f"获取worker信息失败: {e}")
+        slots = {}
+
+    running = list_runs(0, 10000, state="running")["runs"]
+    queued = list_runs(0, 10000, state="queued")["runs"]
+    queues = {}
+    for run in running + queued:
+        queues.setdefault(run.get("queue", "celery"), ([], []))
+    for run in running:
+        queues[run.get("queue", "celery")][0].append(run)
+    for run in queued:
+        queues[run.get("queue", "celery")][1].append(run)
+
+    result = {}
+    for queue, (queue_running, queue_queued) in queues.items():
+        queue_slots = slots.get(queue) or int(os.getenv("CELERY_CONCURRENCY", 4))
+        # list_runs 按提交时间倒序返回, 调度模拟需要先进先出
+        queue_queued.sort(key=lambda run: run.get("created_at", 0))
+        result[queue] = estimate_queue(queue_running, queue_queued, queue_slots)
+        result[queue]["worker_online"] = queue in slots
+    return {"queues": result}
+
+
+@app.get("/api/storage/usage")
+def get_storage_usage():
+    """共享数据卷的用量与空间预留"""
+    return volume_usage()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus 文本格式的共享数据卷指标"""
+    usage = volume_usage()
+    lines = []
+    for name, key, help_text in (
+        ("nylab_data_volume_total_bytes", "total_bytes", "共享数据卷总容量"),
+        ("nylab_data_volume_used_bytes", "used_bytes", "共享数据卷已用空间"),
+        ("nylab_data_volume_reserved_bytes", "reserved_bytes", "已预留但尚未写入的空间"),
+        ("nylab_data_volume_reservations", "reservations", "持有空间预留的运行数"),
+        ("nylab_data_volume_projected_ratio", "projected_ratio", "计入预留后的预计占用比例"),
+    ):
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {usage[key]}"]
+    return "\n".join(lines) + "\n"
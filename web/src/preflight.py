@@ -0,0 +1,223 @@
+import os
+import ast
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+from backend_common.yolo_dataset import dataset_root, split_images
+
+# 预检抽样数量与并发线程数
+PREFLIGHT_SAMPLE_SIZE = int(os.getenv("PREFLIGHT_SAMPLE_SIZE", 32))
+PREFLIGHT_WORKERS = int(os.getenv("PREFLIGHT_WORKERS", 8))
+# 训练入口必须能接收的参数
+_ENTRY_ARGS = ("dataset_path", "run_id", "update_progress")
+
+
+def check_script(script_path: str, world_size: int = 1, stream: bool = False, hyperparams: dict = None) -> tuple:
+    """静态检查训练脚本(不执行), 返回 (错误列表, 脚本声明的数据集要求)
+
+    hyperparams 中存在 nylab_train 未声明的参数时, 才要求其接收 **hyperparams
+
+    脚本可在模块顶层声明数据集要求, 例如:
+        NYLAB_DATASET = {"format": "yolo", "required": ["dataset.yaml"]}
+    """
+    errors = []
+    expectations = {}
+    try:
+        with open(script_path, "rb") as f:
+            tree = ast.parse(f.read(), filename=os.path.basename(script_path))
+    except SyntaxError as e:
+        return [f"脚本语法错误: 第{e.lineno}行: {e.msg}"], expectations
+    except (OSError, ValueError) as e:
+        return [f"无法读取脚本: {e}"], expectations
+
+    entry = None
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "nylab_train":
+            entry = node
+        elif isinstance(node, ast.Assign) and any(
+            isinstance(target, ast.Name) and target.id == "NYLAB_DATASET" for target in node.targets
+        ):
+            try:
+                expectations = ast.literal_eval(node.value)
+            except ValueError:
+                expectations = None
+            if not isinstance(expectations, dict):
+                errors.append(f"NYLAB_DATASET 必须是字面量字典: 第{node.lineno}行")
+                expectations = {}
+
+    if entry is None:
+        errors.append("脚本缺少顶层函数 nylab_train")
+    else:
+        args = entry.args
+        names = [a.arg for a in args.posonlyargs + args.args + args.kwonlyargs]
+        missing = [name for name in _ENTRY_ARGS if name not in names]
+        if missing and args.kwarg is None:
+            errors.append(f"nylab_train 缺少参数: {', '.join(missing)}")
+        unknown = [key for key in (hyperparams or {}) if key not in names]
+        if unknown and args.kwarg is None:
+            errors.append(f"nylab_train 未声明超参数且没有 **hyperparams: {', '.join(unknown)}")
+        if world_size > 1 and "distributed" not in names:
+            errors.append("分布式训练要求 nylab_train 声明 distributed 参数")
+        if stream and "dataset" not in names:
+            errors.append("流式数据集要求 nylab_train 声明 dataset 参数")
+    return errors, expectations
+
+
+def _check_image(path: str):
+    from PIL import Image
+
+    try:
+        with Image.open(path) as im:
+            im.load()
+    except Exception as e:
+        return f"图片无法解码: {path}: {e}"
+    return None
+
+
+def _check_label(path: str, nc: int, kpt_shape: list = None):
+    """检查YOLO标签文件
+
+    检测/分割: 类别 + 边框(4列)或多边形(偶数个坐标), 列数为奇数;
+    姿态(dataset.yaml 声明 kpt_shape=[关键点数, 2或3]): 类别 + 边框 + 关键点, 可见性取值 0/1/2
+    """
+    if not os.path.exists(path):
+        return None  # 无标签文件视为背景图片
+    try:
+        with open(path, "r") as f:
+            for lineno, line in enumerate(f, 1):
+                values = line.split()
+                if not values:
+                    continue
+                cls = int(values[0])
+                if kpt_shape:
+                    nk, ndim = kpt_shape
+                    if len(values) != 5 + nk * ndim:
+                        return f"标签列数错误(kpt_shape={kpt_shape}): {path}:{lineno}"
+                    numbers = [float(v) for v in values[1:]]
+                    coords = numbers[:4] + [v for i, v in enumerate(numbers[4:]) if ndim != 3 or i % 3 != 2]
+                    visibility = numbers[4:][2::3] if ndim == 3 else []
+                    if any(v not in (0, 1, 2) for v in visibility):
+                        return f"关键点可见性必须为0/1/2: {path}:{lineno}"
+                elif len(values) < 5 or len(values) % 2 == 0:
+                    return f"标签列数错误: {path}:{lineno}"
+                else:
+                    coords = [float(v) for v in values[1:]]
+                if nc is not None and not 0 <= cls < nc:
+                    return f"类别越界(nc={nc}): {path}:{lineno}"
+                if any(not 0 <= v <= 1 for v in coords):
+                    return f"坐标未归一化到[0,1]: {path}:{lineno}"
+    except (ValueError, UnicodeDecodeError) as e:
+        return f"标签格式错误: {path}: {e}"
+    return None
+
+
+def _label_path(image_path: str) -> str:
+    """按 ultralytics 约定由图片路径推导标签路径(images -> labels, 扩展名 .txt)"""
+    sep = os.sep
+    head, _, tail = image_path.rpartition(f"{sep}images{sep}")
+    base = f"{head}{sep}labels{sep}{tail}" if head else image_path
+    return os.path.splitext(base)[0] + ".txt"
+
+
+def _check_yolo(dataset_path: str, pool: ThreadPoolExecutor) -> tuple:
+    import yaml
+
+    errors, warnings, checked = [], [], {}
+    yaml_path = os.path.join(dataset_path, "dataset.yaml")
+    try:
+        with open(yaml_path, "r") as f:
+            data = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError) as e:
+        return [f"dataset.yaml 解析失败: {e}"], warnings, checked
+
+    for key in ("train", "val"):
+        if key not in data:
+            errors.append(f"dataset.yaml 缺少字段: {key}")
+    names = data.get("names")
+    nc = data.get("nc", len(names) if names is not None else None)
+    if nc is None:
+        errors.append("dataset.yaml 缺少字段: names 或 nc")
+    kpt_shape = data.get("kpt_shape")
+    if kpt_shape is not None and not (
+        isinstance(kpt_shape, list) and len(kpt_shape) == 2 and kpt_shape[1] in (2, 3)
+    ):
+        errors.append(f"dataset.yaml 的 kpt_shape 必须为 [关键点数, 2或3]: {kpt_shape}")
+    if errors:
+        return errors, warnings, checked
+
+    if dataset_root(data, dataset_path)[1]:
+        warnings.append(f"dataset.yaml 的 path 不存在, 使用暂存目录: {data['path']}")
+
+    for key in ("train", "val"):
+        images, missing = split_images(data, key, dataset_path)
+        if missing:
+            errors.extend(f"数据集路径不存在: {os.path.relpath(path, dataset_path)}" for path in missing)
+            continue
+        if not images:
+            errors.append(f"{key} 中没有图片")
+            continue
+        sample = random.sample(images, min(len(images), PREFLIGHT_SAMPLE_SIZE))
+        results = list(pool.map(_check_image, sample))
+        results += list(pool.map(lambda p: _check_label(_label_path(p), nc, kpt_shape), sample))
+        errors.extend(r for r in results if r)
+        missing_labels = sum(1 for p in sample if not os.path.exists(_label_path(p)))
+        if missing_labels == len(sample):
+            warnings.append(f"{key} 抽样图片均无标签文件, 请检查 labels 目录")
+        checked[key] = {"images": len(images), "sampled": len(sample)}
+    return errors, warnings, checked
+
+
+def run_preflight(
+    dataset_path: str,
+    script_path: str,
+    world_size: int = 1,
+    stream: bool = False,
+    hyperparams: dict = None,
+    expectations: dict = None
+) -> dict:
+    """提交训练前的快速预检, 在几秒内拒绝必然失败的运行
+
+    Args:
+        dataset_path: 暂存后的数据集目录
+        script_path: 训练脚本路径
+        world_size: 分布式训练组大小
+        stream: 流式数据集模式, 数据集不暂存到本地, 只检查脚本
+        hyperparams: 提交的训练超参数, 用于检查脚本能否接收
+        expectations: 调用方已在暂存数据集前执行 check_script 时, 传入其返回的数据集要求以跳过脚本检查
+    Returns:
+        预检报告 {"ok", "errors", "warnings", "checked", "elapsed"}
+    """
+    started = time.monotonic()
+    if expectations is None:
+        errors, expectations = check_script(script_path, world_size, stream, hyperparams)
+    else:
+        errors = []
+    warnings = []
+    checked = {}
+    if stream:
+        return {
+            "ok": not errors,
+            "errors": errors,
+            "warnings": warnings,
+            "checked": checked,
+            "elapsed": time.monotonic() - started
+        }
+
+    if not any(files for _, _, files in os.walk(dataset_path)):
+        errors.append("数据集为空")
+    for name in expectations.get("required", []):
+        if not os.path.exists(os.path.join(dataset_path, name)):
+            errors.append(f"数据集缺少脚本要求的文件: {name}")
+
+    if expectations.get("format") == "yolo" and os.path.exists(os.path.join(dataset_path, "dataset.yaml")):
+        with ThreadPoolExecutor(max_workers=PREFLIGHT_WORKERS) as pool:
+            yolo_errors, warnings, checked = _check_yolo(dataset_path, pool)
+        errors.extend(yolo_errors)
+
+    return {
+        "ok": not errors,
+        "errors": errors,
+        "warnings": warnings,
+        "checked": checked,
+        "elapsed": time.monotonic() - started
+    }
@@ -1 +1,2 @@
-from .train_task import train_task
\ No newline at end of file
+from .train_task import train_task
+from .distributed_task import distributed_train_task
\ No newline at end of file
@@ -0,0 +1,218 @@
+import os
+import time
+import shutil
+import inspect
+import logging
+from celery.signals import task_revoked
+from celery.utils.log import get_task_logger
+import mlflow
+from backend_common.run_registry import update_run, get_run
+from backend_common.storage import get_minio_client
+from backend_common.space_manager import release
+from backend_common.gang import release_gang
+from ..utils.progress import update_progress
+from ..utils.artifacts import publish_artifacts, publish_onnx_export
+from ..utils.database import load_training_module
+from ..utils.cancellation import RunCancelled, CancelWatchdog, make_cancellable_progress
+from ..utils.cpu_budget import CpuBudget
+from ..utils.distributed import (
+    DistributedAborted,
+    rendezvous,
+    abort_group,
+    cleanup_group,
+    stage_shard,
+    remove_staging,
+    init_process_group,
+    destroy_process_group
+)
+from ..celery_app import celery_app
+
+
+# MinIO客户端配置(进程内共享连接池, 线程安全)
+minio_client = get_minio_client()
+
+
+def _silent_progress(run_id, progress, message, *args, **kwargs):
+    """非0号rank不上报进度, 仅保留取消检查"""
+
+
+@celery_app.task(bind=True)
+def distributed_train_task(
+    self,
+    run_id: str,
+    rank: int,
+    world_size: int,
+    task_config: dict
+):
+    """多worker数据并行训练(CPU, gloo后端)中的一个rank
+
+    同一提交会发送 world_size 个本任务, 通过Redis就位后组成进程组;
+    每个rank从暂存桶下载自己的数据分片, 进度、指标与产物只由rank 0记录
+
+    Args:
+        run_id: 训练运行ID
+        rank: 本任务在训练组中的序号
+        world_size: 训练组大小
+        task_config: 模型训练参数
+    """
+    logger = get_task_logger(__name__)
+    logger.setLevel(logging.INFO)
+
+    is_master = rank == 0
+    local_dir = f"/data/{run_id}/rank{rank}"
+    report = update_progress if is_master else _silent_progress
+    progress_callback = make_cancellable_progress(run_id, report)
+    watchdog = CancelWatchdog(celery_app, self.request.id, run_id)
+    watchdog.start()
+    cpu_budget = None
+    original_cwd = os.getcwd()
+
+    try:
+        if is_master:
+            update_progress(run_id, 0, f"等待 {world_size} 个worker就位")
+            update_run(run_id, "running", started_at=time.time())
+        addr, port = rendezvous(run_id, rank, world_size)
+        logger.info(f"rank {rank}/{world_size} 就位, master={addr}:{port}")
+
+        progress_callback(run_id, 5, "下载数据分片")
+        dataset_path, script_path = stage_shard(minio_client, run_id, rank, world_size, local_dir)
+
+        cpu_budget = CpuBudget(f"{run_id}-rank{rank}")
+        budget = cpu_budget.acquire()
+        # 线程数只能在训练线程中调整, 由训练脚本上报进度时同步
+        progress_callback = cpu_budget.wrap_progress(progress_callback)
+        init_process_group(addr, port, rank, world_size)
+
+        os.chdir(dataset_path)
+        progress_callback(run_id, 15, "加载训练模块")
+        training_model = load_training_module(script_path)
+        train_kwargs = dict(task_config.get("hyperparams", {}))
+        parameters = inspect.signature(training_model.nylab_train).parameters
+        if "cpu_budget" in parameters:
+            train_kwargs["cpu_budget"] = budget
+        train_kwargs["distributed"] = {"rank": rank, "world_size": world_size, "backend": "gloo"}
+
+        def train():
+            return training_model.nylab_train(
+                dataset_path=dataset_path,
+                run_id=run_id,
+                update_progress=progress_callback,
+                **train_kwargs
+            )
+
+        if not is_master:
+            train()
+            return {"status": "success", "run_id": run_id, "rank": rank}
+
+        mlflow.set_tracking_uri(os.environ["MLFLOW_TRACKING_URI"])
+        mlflow.set_experiment(task_config.get('train_name', 'train'))
+        with mlflow.start_run() as run:
+            mlflow.set_tag("mlflow.runName", f"{task_config.get('train_name', 'train')}-{run_id}")
+            mlflow.log_params({"world_size": world_size, "distributed_backend": "gloo"})
+            update_run(run_id, mlflow_run_id=run.info.run_id)
+            progress_callback(run_id, 25, "开始分布式训练")
+            result = train()
+            os.chdir(original_cwd)
+
+            if 'model_path' in result:
+                for metric_name, metric_value in result.get('metrics', {}).items():
+                    mlflow.log_metric(metric_name, metric_value)
+                compress = task_config.get("compress_artifacts", False)
+                publish_artifacts(minio_client, result['model_path'], "model", compress=compress)
+                output_dir = result.get('output_dir') or os.path.join(dataset_path, "runs", run_id)
+                if os.path.isdir(output_dir):
+                    publish_artifacts(minio_client, output_dir, "runs", compress=compress)
+                try:
+                    cpu_budget.apply_pending()
+                    publish_onnx_export(minio_client, result, train_kwargs.get("imgsz", 640))
+                except Exception as e:
+                    logger.warning(f"ONNX导出失败: {str(e)}")
+
+            accuracy = result.get('accuracy')
+            update_progress(run_id, 100, "训练完成", accuracy=accuracy)
+            update_run(
+                run_id,
+                "succeeded",
+                finished_at=time.time(),
+                accuracy=accuracy,
+                metrics=result.get('metrics', {})
+            )
+            return {"status": "success", "accuracy": accuracy, "run_id": run_id, "rank": rank}
+
+    except RunCancelled:
+        logger.warning(f"rank {rank} 训练已取消: {run_id}")
+        if is_master:
+            update_progress(run_id, 0, "训练已取消", status="cancelled")
+            update_run(run_id, "cancelled", finished_at=time.time())
+        return {"status": "cancelled", "run_id": run_id, "rank": rank}
+    except Exception as e:
+        # 单个rank重试会使训练组永久等待, 分布式任务不重试, 直接通知整个训练组放弃
+        error_msg = f"rank {rank} 训练失败: {str(e)}"
+        logger.exception(error_msg)
+        if not isinstance(e, DistributedAborted):
+            abort_group(run_id, error_msg)
+        if is_master:
+            update_progress(run_id, 0, error_msg, status="failed")
+            update_run(run_id, "failed", finished_at=time.time(), error=error_msg)
+        raise
+    finally:
+        watchdog.stop()
+        os.chdir(original_cwd)
+        if cpu_budget is not None:
+            cpu_budget.release()
+        destroy_process_group()
+        shutil.rmtree(local_dir, ignore_errors=True)
+        try:
+            # 同节点的其他rank共用 /data/{run_id}, 仅在为空时删除
+            os.rmdir(os.path.dirname(local_dir))
+        except OSError:
+            pass
+        if is_master:
+            cleanup_group(run_id)
+            release_gang(run_id)
+            release(run_id)
+            try:
+                remove_staging(minio_client, run_id)
+            except Exception as e:
+                logger.warning(f"清理分布式暂存数据失败: {str(e)}")
+
+
+@task_revoked.connect(sender=distributed_train_task)
+def on_distributed_task_revoked(request=None, terminated=None, **kwargs):
+    """rank被撤销(排队中撤销或宽限期后强制终止)时, 在worker主进程中完成清理
+
+    被强制终止的rank无法执行 finally; rank 0 在开始前被撤销时, 已开始的其他rank
+    响应取消标记后直接退出, 不写运行状态. 因此由rank 0的撤销回调记录取消状态,
+    并释放训练组槽位、空间预留与暂存桶中的数据
+    """
+    logger = get_task_logger(__name__)
+    run_id = request.kwargs.get("run_id")
+    rank = request.kwargs.get("rank")
+    if not run_id:
+        return
+    local_dir = f"/data/{run_id}/rank{rank}"
+    shutil.rmtree(local_dir, ignore_errors=True)
+    try:
+        os.rmdir(os.path.dirname(local_dir))
+    except OSError:
+        pass
+    if rank != 0:
+        return
+
+    abort_group(run_id, f"rank 0 已撤销: {run_id}")
+    cleanup_group(run_id)
+    release_gang(run_id)
+    release(run_id)
+    try:
+        remove_staging(minio_client, run_id)
+    except Exception as e:
+        logger.warning(f"清理分布式暂存数据失败: {str(e)}")
+
+    update_progress(run_id, 0, "训练已取消", status="cancelled")
+    update_run(run_id, "cancelled", finished_at=time.time())
+    run = get_run(run_id) or {}
+    if run.get("mlflow_run_id"):
+        try:
+            mlflow.MlflowClient(os.environ["MLFLOW_TRACKING_URI"]).set_terminated(run["mlflow_run_id"], "KILLED")
+        except Exception as e:
+            logger.warning(f"记录MLflow取消状态失败: {str(e)}")
@@ -1,11 +1,24 @@
 import os
 import io
 import logging
+import time
 import shutil
+import inspect
+from celery.signals import task_revoked
 from celery.utils.log import get_task_logger
 import mlflow
-from minio import Minio
+from backend_common.run_registry import update_run, get_run
+from backend_common.cancellation import is_cancel_requested
+from backend_common.duration_model import record_phase
+from backend_common.storage import get_minio_client
+from backend_common.space_manager import release
 from ..utils.progress import update_progress
+from ..utils.artifacts import publish_artifacts, publish_onnx_export
+from ..utils.cancellation import RunCancelled, CancelWatchdog, make_cancellable_progress
+from ..utils.cpu_budget import CpuBudget
+from ..utils.benchmark import run_cpu_benchmark
+from ..utils.profiling import create_profiler
+from ..utils.streaming import StreamingDataset
 from ..utils.database import (
     load_training_module, 
     archive_dataset,
@@ -21,13 +34,19 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()]
 )
 
-# MinIO客户端配置
-minio_client = Minio(
-    endpoint=os.getenv("MINIO_ENDPOINT", "minio:9000"),
-    access_key=os.environ["AWS_ACCESS_KEY_ID"],
-    secret_key=os.environ["AWS_SECRET_ACCESS_KEY"],
-    secure=False
-)
+# MinIO客户端配置(进程内共享连接池, 线程安全)
+minio_client = get_minio_client()
+
+
+def _record_phase(features: dict, phase: str, started: float) -> None:
+    """记录阶段耗时用于运行时长预测, 统计失败不影响训练"""
+    if not features:
+        return
+    try:
+        record_phase(features, phase, time.monotonic() - started)
+    except Exception as e:
+        logging.getLogger(__name__).warning(f"记录阶段耗时失败: {str(e)}")
+
 
 @celery_app.task(bind=True)
 def train_task(
@@ -51,16 +70,35 @@ def train_task(
     logger.info(f"传入配置1: {task_config}")
     # 初始化进度
     update_progress(run_id, 0, "初始化训练任务")
+    update_run(run_id, "running", started_at=time.time(), retries=self.request.retries)
     run_name=f"{task_config.get('train_name', 'train')}-{run_id}"
     logger.info(f"开始训练任务: {run_name}")
+
+    # 取消支持: 进度回调在每次上报时检查取消标记, 兜底线程负责宽限期后的强制终止
+    progress_callback = make_cancellable_progress(run_id, update_progress)
+    watchdog = CancelWatchdog(celery_app, self.request.id, run_id)
+    watchdog.start()
+    mlflow_run_id = None
+    original_cwd = os.getcwd()
+    # 提交时统计的运行特征, 用于记录各阶段耗时
+    features = (get_run(run_id) or {}).get("features")
+    stream = None
+    cpu_budget = None
+    # 按需性能分析, 未开启时为无开销的空实现
+    profiler = create_profiler(task_config, os.path.join(os.path.dirname(dataset_path), "profile"))
     
     try:
+        if is_cancel_requested(run_id):
+            raise RunCancelled(f"运行已取消: {run_id}")
+
         # 设置MLflow跟踪
         mlflow.set_tracking_uri(os.environ["MLFLOW_TRACKING_URI"])
         mlflow.set_experiment(task_config.get('train_name', 'train'))
         
         with mlflow.start_run() as run:
             mlflow.set_tag("mlflow.runName", run_name)
+            mlflow_run_id = run.info.run_id
+            update_run(run_id, mlflow_run_id=mlflow_run_id)
             # 记录基础参数
             if task_config["use_local_dataset"]:
                 mlflow.log_param(
@@ -83,37 +121,114 @@ def train_task(
                     "脚本来源", 
                     f"数据库:training-scripts/{task_config['db_script_name']}"
                 )
-            update_progress(run_id, 10, "记录基础参数")
+            progress_callback(run_id, 10, "记录基础参数")
             
-            original_cwd = os.getcwd()
             os.chdir(dataset_path)
             # 动态加载脚本
-            update_progress(run_id, 15, "加载训练模块")
-            training_model = load_training_module(script_path)
+            progress_callback(run_id, 15, "加载训练模块")
+            phase_started = time.monotonic()
+            with profiler.phase("load"):
+                training_model = load_training_module(script_path)
+            _record_phase(features, "load", phase_started)
             logger.info(f"成功加载训练模块: {os.path.basename(script_path)}")
             
             # 调用训练函数
             hyperparams = task_config.get("hyperparams", {})
-            update_progress(run_id, 25, "开始模型训练")
+            progress_callback(run_id, 25, "开始模型训练")
+
 
+            # 与同节点的其他训练划分CPU核心, 脚本声明 cpu_budget 参数时传入配额
+            cpu_budget = CpuBudget(run_id)
+            budget = cpu_budget.acquire()
+            # 线程数只能在训练线程中调整, 由训练脚本上报进度时同步
+            progress_callback = cpu_budget.wrap_progress(progress_callback)
+            mlflow.log_param("cpu_cores", budget["cores"])
+            train_kwargs = dict(hyperparams)
+            parameters = inspect.signature(training_model.nylab_train).parameters
+            if "cpu_budget" in parameters:
+                train_kwargs["cpu_budget"] = budget
+            # torch CPU profiler 需要脚本在每个训练步调用 profile_step
+            profile_step = profiler.torch_step()
+            if profile_step is not None and "profile_step" in parameters:
+                train_kwargs["profile_step"] = profile_step
+            # 流式数据集: 不等待完整下载, 脚本通过 dataset 句柄按需读取, 本地只保留有界的块缓存
+            if task_config.get("stream_dataset", False):
+                stream = StreamingDataset(
+                    minio_client,
+                    task_config["db_dataset_bucket_name"],
+                    task_config["db_dataset_name"],
+                    os.path.join(os.path.dirname(dataset_path), "stream-cache")
+                )
+                train_kwargs["dataset"] = stream
 
             logger.info(f"数据集: {dataset_path}")
-            result = training_model.nylab_train(
-                dataset_path=dataset_path,
-                run_id=run_id,
-                update_progress=update_progress,
-                **hyperparams
-            )
+            phase_started = time.monotonic()
+            with profiler.phase("train"):
+                result = training_model.nylab_train(
+                    dataset_path=dataset_path,
+                    run_id=run_id,
+                    update_progress=progress_callback,
+                    **train_kwargs
+                )
+            _record_phase(features, "train", phase_started)
+            if stream is not None:
+                mlflow.log_metrics({
+                    f"stream_{name}": value for name, value in stream.stats().items() if value is not None
+                })
             os.chdir(original_cwd)
+            phase_started = time.monotonic()
             # 处理训练结果
             if 'model_path' in result:
                 # 记录模型指标
                 metrics = result.get('metrics', {})
                 for metric_name, metric_value in metrics.items():
                     mlflow.log_metric(metric_name, metric_value)
-                mlflow.log_artifact(result['model'], "model")
+                compress = task_config.get("compress_artifacts", False)
+                publish_artifacts(minio_client, result['model_path'], "model", compress=compress)
+                # 训练输出目录(检查点、曲线图等), 默认为脚本在数据集目录下生成的 runs/{run_id}
+                output_dir = result.get('output_dir') or os.path.join(dataset_path, "runs", run_id)
+                if os.path.isdir(output_dir):
+                    publish_artifacts(minio_client, output_dir, "runs", compress=compress)
                 logger.info(f"模型保存完成: {run.info.run_id}")
-                update_progress(run_id, "记录模型")
+                update_progress(run_id, 80, "记录模型")
+
+                # 推理服务加载 export/ 下的ONNX, 导出与可选的基准测试无关; 失败不影响训练结果
+                onnx_path = None
+                try:
+                    # 导出与基准测试仍在本运行的CPU配额内进行, 不与节点上的其他训练争抢核心
+                    cpu_budget.apply_pending()
+                    onnx_path = publish_onnx_export(minio_client, result, hyperparams.get("imgsz", 640))
+                except Exception as e:
+                    logger.warning(f"ONNX导出失败: {str(e)}")
+
+                # 可选: CPU导出与推理基准测试, 失败不影响训练结果
+                if task_config.get("cpu_benchmark", False):
+                    update_progress(run_id, 82, "CPU导出与推理基准测试")
+                    try:
+                        benchmark = run_cpu_benchmark(
+                            result,
+                            dataset_path,
+                            hyperparams.get("imgsz", 640),
+                            task_config.get("benchmark_batch_sizes") or [1],
+                            int8=task_config.get("benchmark_int8", False),
+                            cores=cpu_budget.budget["cores"],
+                            onnx_path=onnx_path
+                        )
+                        mlflow.log_metric("cpu_benchmark_cores", benchmark["cores"])
+                        for variant, batches in benchmark["results"].items():
+                            for batch_size, stats in batches.items():
+                                mlflow.log_metrics({
+                                    f"cpu_{variant}_b{batch_size}_{name}": value
+                                    for name, value in stats.items()
+                                })
+                        mlflow.log_dict(benchmark, "export/cpu_benchmark.json")
+                        for path in benchmark["files"].values():
+                            if path != onnx_path:
+                                publish_artifacts(minio_client, path, "export")
+                    except Exception as e:
+                        logger.warning(f"CPU基准测试失败: {str(e)}")
+            cpu_budget.release()
+            cpu_budget = None
             
             # 是否储藏数据集
             if task_config["use_local_dataset"]:
@@ -163,9 +278,18 @@ def train_task(
                 logger.info("非本地脚本，不进行归档")
         
             # 完成训练
+            _record_phase(features, "finalize", phase_started)
             accuracy = result.get('accuracy')
             update_progress(run_id, 100, "训练完成", accuracy=accuracy)
             logger.info(f"训练完成: 准确率={accuracy}")
+            update_run(
+                run_id,
+                "succeeded",
+                finished_at=time.time(),
+                accuracy=accuracy,
+                metrics=result.get('metrics', {}),
+                mlflow_run_id=run.info.run_id
+            )
             
             return {
                 "status": "success",
@@ -173,14 +297,65 @@ def train_task(
                 "run_id": run_id
             }
     
+    except RunCancelled:
+        logger.warning(f"训练已取消: {run_name}")
+        update_progress(run_id, 0, "训练已取消", status="cancelled")
+        update_run(run_id, "cancelled", finished_at=time.time())
+        if mlflow_run_id:
+            mlflow.MlflowClient().set_terminated(mlflow_run_id, "KILLED")
+        return {
+            "status": "cancelled",
+            "run_id": run_id
+        }
     except Exception as e:
         error_msg = f"训练失败: {str(e)}"
         logger.exception(error_msg)
         update_progress(run_id, 0, error_msg, status="failed")
         mlflow.log_param("error_message", error_msg)
+        update_run(run_id, "failed", finished_at=time.time(), error=error_msg)
         raise self.retry(exc=e, countdown=60)
     finally:
+        watchdog.stop()
+        if cpu_budget is not None:
+            cpu_budget.release()
+        if stream is not None:
+            stream.close()
+        os.chdir(original_cwd)
+        # 失败或取消的运行同样上传性能数据, 此时MLflow运行已结束, 需指定运行ID
+        profile_dir = profiler.finish()
+        if profile_dir and mlflow_run_id:
+            try:
+                publish_artifacts(minio_client, profile_dir, "profile", mlflow_run_id=mlflow_run_id)
+            except Exception as e:
+                logger.warning(f"上传性能分析结果失败: {str(e)}")
         try:
             shutil.rmtree(os.path.dirname(dataset_path))  # 清理 /data/{run_id}
         except Exception as e:
-            logger.warning(f"清理临时目录失败: {str(e)}")        
\ No newline at end of file
+            logger.warning(f"清理临时目录失败: {str(e)}")
+        release(run_id)
+
+
+@task_revoked.connect(sender=train_task)
+def on_train_task_revoked(request=None, terminated=None, **kwargs):
+    """任务被撤销(排队中撤销或宽限期后强制终止)时, 在worker主进程中完成清理
+
+    被强制终止的子进程无法执行 finally, 因此由此处清理 /data/{run_id} 并记录取消状态
+    """
+    logger = get_task_logger(__name__)
+    run_id = request.kwargs.get("run_id")
+    dataset_path = request.kwargs.get("dataset_path")
+    if dataset_path:
+        shutil.rmtree(os.path.dirname(dataset_path), ignore_errors=True)
+    if not run_id:
+        return
+    release(run_id)
+
+    update_progress(run_id, 0, "训练已取消", status="cancelled")
+    update_run(run_id, "cancelled", finished_at=time.time())
+    run = get_run(run_id) or {}
+    if run.get("mlflow_run_id"):
+        try:
+            mlflow.MlflowClient(os.environ["MLFLOW_TRACKING_URI"]).set_terminated(run["mlflow_run_id"], "KILLED")
+        except Exception as e:
+            logger.warning(f"记录MLflow取消状态失败: {str(e)}")
+    logger.info(f"运行已撤销: {run_id} (强制终止={terminated})")        
\ No newline at end of file
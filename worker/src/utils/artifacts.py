@@ -0,0 +1,204 @@
+import os
+import gzip
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import redis
+from minio import Minio
+from minio.commonconfig import CopySource, REPLACE
+from minio.error import S3Error
+import mlflow
+from .progress import REDIS_POOL
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 并行上传的文件数与单文件分块并发数
+ARTIFACT_UPLOAD_WORKERS = int(os.getenv("ARTIFACT_UPLOAD_WORKERS", 4))
+ARTIFACT_PART_PARALLEL = int(os.getenv("ARTIFACT_PART_PARALLEL", 3))
+ARTIFACT_PART_SIZE = 16 * 1024 * 1024
+# 已压缩格式, 开启压缩时也原样上传
+_COMPRESSED_SUFFIXES = {".pt", ".pth", ".onnx", ".zip", ".gz", ".png", ".jpg", ".jpeg", ".webp", ".mp4"}
+# 内容索引的保留时间: 校验和 -> 已上传的对象, 用于跨运行(含重试)的服务端复制去重
+ARTIFACT_INDEX_TTL = int(os.getenv("ARTIFACT_INDEX_TTL", 30 * 24 * 3600))
+
+
+def _sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _artifact_location(artifact_path: str = None, mlflow_run_id: str = None) -> tuple:
+    """解析MLflow运行(默认当前活动运行)的产物位置, 返回 (桶, 对象前缀)"""
+    if mlflow_run_id is None:
+        artifact_uri = mlflow.get_artifact_uri(artifact_path)
+    else:
+        artifact_uri = mlflow.MlflowClient().get_run(mlflow_run_id).info.artifact_uri
+        if artifact_path:
+            artifact_uri = f"{artifact_uri.rstrip('/')}/{artifact_path}"
+    uri = urlparse(artifact_uri)
+    if uri.scheme != "s3":
+        raise ValueError(f"仅支持S3(MinIO)产物存储: {uri.geturl()}")
+    return uri.netloc, uri.path.lstrip("/")
+
+
+def _stat_checksum(minio_client: Minio, bucket: str, object_name: str) -> str:
+    """返回对象记录的sha256元数据, 对象不存在时返回 None"""
+    try:
+        stat = minio_client.stat_object(bucket, object_name)
+    except S3Error as e:
+        if e.code in ("NoSuchKey", "NoSuchBucket"):
+            return None
+        raise
+    return (stat.metadata or {}).get("x-amz-meta-sha256")
+
+
+def _upload_one(minio_client: Minio, bucket: str, object_name: str, file_path: str, compress: bool) -> str:
+    """上传单个文件, 按内容去重
+
+    每次尝试(包括Celery重试)都是新的MLflow运行, 产物前缀各不相同, 因此按校验和在Redis中
+    索引已上传的对象; 内容相同时以服务端复制代替上传(如 model/ 与 runs/.../weights/best.pt)
+
+    Returns:
+        "uploaded"、"copied"(服务端复制) 或 "skipped"(目标对象已是相同内容)
+    """
+    checksum = _sha256(file_path)
+    compress = compress and os.path.splitext(file_path)[1].lower() not in _COMPRESSED_SUFFIXES
+    if compress:
+        object_name = f"{object_name}.gz"
+
+    if _stat_checksum(minio_client, bucket, object_name) == checksum:
+        return "skipped"
+
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    index_key = f"artifacts:sha256:{checksum}{'.gz' if compress else ''}"
+    source = r.get(index_key)
+    if source is not None:
+        source_bucket, source_object = source.decode().split("/", 1)
+        # 源对象可能已随MLflow运行删除, 校验和一致才复制
+        if _stat_checksum(minio_client, source_bucket, source_object) == checksum:
+            # 超过5GiB时 copy_object 改用 compose, 不支持复制元数据, 因此显式写入校验和
+            metadata = {"sha256": checksum}
+            if compress:
+                metadata["Content-Type"] = "application/gzip"
+            minio_client.copy_object(
+                bucket, object_name, CopySource(source_bucket, source_object),
+                metadata=metadata, metadata_directive=REPLACE
+            )
+            return "copied"
+
+    metadata = {"sha256": checksum}
+    if compress:
+        with tempfile.NamedTemporaryFile(suffix=".gz", delete=False) as tmp:
+            with open(file_path, "rb") as src, gzip.GzipFile(fileobj=tmp, mode="wb") as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+        try:
+            minio_client.fput_object(
+                bucket, object_name, tmp.name,
+                content_type="application/gzip",
+                metadata=metadata,
+                part_size=ARTIFACT_PART_SIZE,
+                num_parallel_uploads=ARTIFACT_PART_PARALLEL
+            )
+        finally:
+            os.remove(tmp.name)
+    else:
+        minio_client.fput_object(
+            bucket, object_name, file_path,
+            metadata=metadata,
+            part_size=ARTIFACT_PART_SIZE,
+            num_parallel_uploads=ARTIFACT_PART_PARALLEL
+        )
+    r.set(index_key, f"{bucket}/{object_name}", ex=ARTIFACT_INDEX_TTL)
+    return "uploaded"
+
+
+def publish_artifacts(
+    minio_client: Minio,
+    local_path: str,
+    artifact_path: str = None,
+    compress: bool = False,
+    mlflow_run_id: str = None
+) -> dict:
+    """将文件或整个输出目录并行上传到当前MLflow运行的产物位置
+
+    对象直接写入运行的 artifact_uri 之下, MLflow 列举产物时即可看到;
+    同时记录一份清单(manifest)到运行中, 便于追溯校验和与压缩情况
+
+    Args:
+        minio_client: MinIO客户端实例
+        local_path: 本地文件或目录
+        artifact_path: 运行内的产物子路径
+        compress: 是否对未压缩格式的文件进行gzip压缩(对象名追加 .gz)
+        mlflow_run_id: 目标MLflow运行ID, 默认为当前活动运行(运行结束后上传时需指定)
+    Returns:
+        {相对路径: "uploaded" | "copied" | "skipped"}
+    """
+    bucket, prefix = _artifact_location(artifact_path, mlflow_run_id)
+    if os.path.isdir(local_path):
+        files = []
+        for root, _, names in os.walk(local_path):
+            for name in names:
+                file_path = os.path.join(root, name)
+                files.append((os.path.relpath(file_path, local_path), file_path))
+    else:
+        files = [(os.path.basename(local_path), local_path)]
+
+    with ThreadPoolExecutor(max_workers=ARTIFACT_UPLOAD_WORKERS) as pool:
+        futures = {
+            rel_path: pool.submit(
+                _upload_one,
+                minio_client,
+                bucket,
+                f"{prefix}/{rel_path.replace(os.sep, '/')}",
+                file_path,
+                compress
+            )
+            for rel_path, file_path in files
+        }
+        results = {rel_path: future.result() for rel_path, future in futures.items()}
+
+    manifest_name = f"{artifact_path or 'root'}_{os.path.basename(local_path.rstrip(os.sep))}".replace("/", "_")
+    manifest = json.dumps({"compress": compress, "files": results}, ensure_ascii=False, indent=2)
+    if mlflow_run_id is None:
+        mlflow.log_text(manifest, f"manifests/{manifest_name}.json")
+    else:
+        mlflow.MlflowClient().log_text(mlflow_run_id, manifest, f"manifests/{manifest_name}.json")
+    uploaded = sum(1 for status in results.values() if status == "uploaded")
+    copied = sum(1 for status in results.values() if status == "copied")
+    logger.info(
+        f"产物上传完成: {local_path} -> s3://{bucket}/{prefix}, "
+        f"上传 {uploaded} 个, 服务端复制 {copied} 个, 跳过 {len(results) - uploaded - copied} 个"
+    )
+    return results
+
+
+def publish_onnx_export(minio_client: Minio, result: dict, imgsz: int) -> str:
+    """导出ONNX并发布到当前MLflow运行的 export/, 推理服务从此处加载模型
+
+    同时记录 export/export.json(训练输入尺寸): 动态输入的ONNX无法从模型中读出训练尺寸
+
+    Args:
+        minio_client: MinIO客户端实例
+        result: nylab_train 的返回结果
+        imgsz: 训练输入尺寸
+    Returns:
+        ONNX文件路径; 结果既不是 yolo 框架也没有提供 onnx_path 时不导出, 返回 None
+    """
+    if not result.get("onnx_path") and result.get("framework") != "yolo":
+        return None
+    from .benchmark import export_onnx
+
+    onnx_path = export_onnx(result, imgsz)
+    publish_artifacts(minio_client, onnx_path, "export")
+    mlflow.log_dict({"imgsz": imgsz}, "export/export.json")
+    return onnx_path
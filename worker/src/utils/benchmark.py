@@ -0,0 +1,161 @@
+import os
+import time
+import logging
+import numpy as np
+from backend_common.letterbox import letterbox
+from backend_common.yolo_dataset import list_images, split_images
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 基准测试使用的固定样本数与每个batch size的计时次数
+BENCHMARK_SAMPLES = int(os.getenv("BENCHMARK_SAMPLES", 32))
+BENCHMARK_WARMUP = 3
+BENCHMARK_ITERS = int(os.getenv("BENCHMARK_ITERS", 30))
+
+
+def export_onnx(result: dict, imgsz: int) -> str:
+    """导出ONNX模型, 返回ONNX文件路径
+
+    训练脚本可在结果中直接提供 onnx_path; 否则 yolo 框架使用 ultralytics 导出(动态batch)
+    """
+    if result.get("onnx_path"):
+        return result["onnx_path"]
+    if result.get("framework") != "yolo":
+        raise ValueError(f"不支持自动导出的框架: {result.get('framework')}, 请在结果中提供 onnx_path")
+    from ultralytics import YOLO
+
+    return YOLO(result["model_path"]).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=False)
+
+
+def quantize_int8(onnx_path: str) -> str:
+    """动态INT8量化(权重量化, 无需校准数据)"""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    int8_path = f"{os.path.splitext(onnx_path)[0]}_int8.onnx"
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    return int8_path
+
+
+def _yaml_split_images(dataset_path: str) -> list:
+    """按 dataset.yaml 的 val(缺失时 train) 条目列出图片, 无法解析时返回空列表"""
+    import yaml
+
+    try:
+        with open(os.path.join(dataset_path, "dataset.yaml"), "r") as f:
+            data = yaml.safe_load(f) or {}
+    except (OSError, yaml.YAMLError):
+        return []
+    for key in ("val", "train"):
+        images, _ = split_images(data, key, dataset_path)
+        if images:
+            return images
+    return []
+
+
+def load_sample(dataset_path: str, imgsz: int, exclude: tuple = ()) -> np.ndarray:
+    """取数据集中固定的前N张图片, letterbox 预处理为 NCHW float32
+
+    优先使用 dataset.yaml 的验证集; 否则遍历数据集目录, 跳过训练输出目录
+    (数据集目录同时是训练的工作目录, 其中的 runs/ 含有 ultralytics 生成的图表)
+
+    Args:
+        dataset_path: 数据集路径
+        imgsz: 输入尺寸
+        exclude: 需要跳过的目录(训练输出目录)
+    """
+    import cv2
+
+    images = _yaml_split_images(dataset_path) or list_images(
+        dataset_path, tuple(os.path.abspath(p) for p in exclude)
+    )
+    batch = []
+    for path in sorted(images)[:BENCHMARK_SAMPLES]:
+        im = cv2.imread(path)
+        if im is None:
+            continue
+        batch.append(letterbox(im, imgsz)[0])
+    if not batch:
+        raise ValueError(f"数据集中没有可用于基准测试的图片: {dataset_path}")
+    return np.ascontiguousarray(np.stack(batch), dtype=np.float32) / 255.0
+
+
+def benchmark_onnx(onnx_path: str, sample: np.ndarray, batch_sizes: list, threads: int = None) -> dict:
+    """在CPU上测量各batch size的延迟分位数与吞吐量
+
+    Args:
+        onnx_path: ONNX模型路径
+        sample: load_sample 返回的样本
+        batch_sizes: 测试的batch size列表
+        threads: onnxruntime 的 intra-op 线程数, 为空时使用默认值(进程可用的全部核心)
+    Returns:
+        {batch_size: {"p50_ms", "p90_ms", "p99_ms", "throughput"}}
+    """
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = threads
+    session = ort.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+    input_name = session.get_inputs()[0].name
+    report = {}
+    for batch_size in batch_sizes:
+        # 样本不足时循环补齐, 保证每个batch输入一致
+        indices = np.arange(batch_size) % len(sample)
+        batch = sample[indices]
+        for _ in range(BENCHMARK_WARMUP):
+            session.run(None, {input_name: batch})
+        latencies = []
+        for _ in range(BENCHMARK_ITERS):
+            started = time.perf_counter()
+            session.run(None, {input_name: batch})
+            latencies.append(time.perf_counter() - started)
+        latencies = np.array(latencies) * 1000
+        report[batch_size] = {
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p90_ms": float(np.percentile(latencies, 90)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "throughput": float(batch_size * 1000 / latencies.mean())
+        }
+    return report
+
+
+def run_cpu_benchmark(
+    result: dict,
+    dataset_path: str,
+    imgsz: int,
+    batch_sizes: list,
+    int8: bool = False,
+    cores: int = None,
+    onnx_path: str = None
+) -> dict:
+    """训练后的CPU导出与推理基准测试
+
+    Args:
+        result: nylab_train 的返回结果
+        dataset_path: 运行的数据集路径(用于抽取固定样本)
+        imgsz: 输入尺寸
+        batch_sizes: 测试的batch size列表
+        int8: 是否额外测试INT8量化模型
+        cores: 运行的CPU配额核心数, 作为 onnxruntime 的线程数, 并随结果记录
+            (延迟与吞吐量只在相同核心数下可比)
+        onnx_path: 发布时已导出的ONNX文件, 为空时在此导出
+    Returns:
+        {"imgsz": 输入尺寸, "cores": 核心数, "files": {变体: 文件路径}, "results": {变体: {batch_size: 指标}}}
+    """
+    files = {"fp32": onnx_path or export_onnx(result, imgsz)}
+    if int8:
+        files["int8"] = quantize_int8(files["fp32"])
+
+    # 训练输出目录: 脚本返回的 output_dir 与默认的 runs/
+    exclude = [os.path.join(dataset_path, "runs")]
+    if result.get("output_dir"):
+        exclude.append(result["output_dir"])
+    sample = load_sample(dataset_path, imgsz, tuple(exclude))
+    results = {}
+    for variant, path in files.items():
+        results[variant] = benchmark_onnx(path, sample, batch_sizes, cores)
+        logger.info(f"CPU基准测试 {variant}: {results[variant]}")
+    return {"imgsz": imgsz, "cores": cores, "files": files, "results": results}
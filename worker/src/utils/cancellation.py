@@ -0,0 +1,63 @@
+import os
+import time
+import logging
+import threading
+from backend_common.cancellation import cancel_requested_at, is_cancel_requested
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 协作式取消的宽限期, 超时后强制终止任务进程
+CANCEL_GRACE_SECONDS = float(os.getenv("CANCEL_GRACE_SECONDS", 30))
+CANCEL_POLL_SECONDS = 2
+
+
+class RunCancelled(Exception):
+    """训练运行被用户取消"""
+
+
+def make_cancellable_progress(run_id: str, update_progress):
+    """包装进度回调: 每次上报进度后检查取消标记, 已取消则抛出 RunCancelled
+
+    Args:
+        run_id: 训练运行ID
+        update_progress: 原始进度回调 (run_id, progress, message, ...)
+    """
+    def cancellable_progress(run_id_, progress, message, *args, **kwargs):
+        update_progress(run_id_, progress, message, *args, **kwargs)
+        if is_cancel_requested(run_id):
+            raise RunCancelled(f"运行已取消: {run_id}")
+    return cancellable_progress
+
+
+class CancelWatchdog(threading.Thread):
+    """强制终止的兜底线程
+
+    训练脚本可能长时间不上报进度, 取消标记出现后等待宽限期,
+    任务仍未结束则通过 Celery 强制终止当前任务进程以释放worker槽位
+    """
+
+    def __init__(self, celery_app, task_id: str, run_id: str, grace: float = CANCEL_GRACE_SECONDS):
+        super().__init__(name=f"cancel-watchdog-{run_id}", daemon=True)
+        self.celery_app = celery_app
+        self.task_id = task_id
+        self.run_id = run_id
+        self.grace = grace
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(CANCEL_POLL_SECONDS):
+            requested_at = cancel_requested_at(self.run_id)
+            if requested_at is None:
+                continue
+            remaining = requested_at + self.grace - time.time()
+            if self._stopped.wait(max(remaining, 0)):
+                return
+            logger.warning(f"运行 {self.run_id} 在宽限期 {self.grace}s 内未响应取消, 强制终止")
+            self.celery_app.control.revoke(self.task_id, terminate=True, signal="SIGKILL")
+            return
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,160 @@
+import os
+import time
+import socket
+import logging
+import threading
+import redis
+from .progress import REDIS_POOL
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 在worker主进程导入时记录节点可用核心, 子进程被限制亲和性后仍能恢复
+NODE_CPUS = sorted(os.sched_getaffinity(0))
+HOSTNAME = socket.gethostname()
+REBALANCE_SECONDS = float(os.getenv("CPU_REBALANCE_SECONDS", 10))
+# 存活标记过期时间, 崩溃的训练进程超时后不再占用核心
+_ALIVE_TTL = int(REBALANCE_SECONDS * 3)
+_THREAD_ENV = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def _split_cores(cpus: list, n: int, rank: int) -> list:
+    """将核心按运行顺序均分为连续区间, 运行数超过核心数时轮流共享单个核心"""
+    if n > len(cpus):
+        return [cpus[rank % len(cpus)]]
+    base, extra = divmod(len(cpus), n)
+    start = rank * base + min(rank, extra)
+    return cpus[start:start + base + (1 if rank < extra else 0)]
+
+
+def make_budget(cpus: list) -> dict:
+    """根据分配的核心计算线程配置与建议的 dataloader workers"""
+    cores = len(cpus)
+    workers = cores // 2 if cores >= 4 else 0
+    intra_op = max(cores - workers, 1)
+    return {
+        "cpus": cpus,
+        "cores": cores,
+        "intra_op_threads": intra_op,
+        "inter_op_threads": min(2, intra_op),
+        "dataloader_workers": workers
+    }
+
+
+def _set_affinity(cpus: list) -> None:
+    """设置进程内所有线程的CPU亲和性(Linux下 sched_setaffinity 以线程为单位)"""
+    for tid in os.listdir("/proc/self/task"):
+        try:
+            os.sched_setaffinity(int(tid), cpus)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+
+def _apply_threads(budget: dict, first: bool) -> None:
+    """设置线程数; 必须在训练线程中调用
+
+    torch.set_num_threads/omp_set_num_threads 只作用于调用线程的 OpenMP 设置,
+    在后台线程中调用时训练线程仍保持旧的 intra-op 线程数
+    """
+    for name in _THREAD_ENV:
+        os.environ[name] = str(budget["intra_op_threads"])
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(budget["intra_op_threads"])
+    if first:
+        try:
+            # inter-op 线程池只能在首次并行任务前设置一次, 复用的子进程中会失败
+            torch.set_num_interop_threads(budget["inter_op_threads"])
+        except RuntimeError:
+            pass
+
+
+class CpuBudget(threading.Thread):
+    """同一worker节点上并发训练之间的CPU核心划分
+
+    每个训练在 Redis 中登记自己, 按开始时间排序后均分节点核心;
+    后台线程周期性重新计算, 有训练开始或结束时立即调整亲和性(对所有线程生效),
+    线程数则在训练线程下一次上报进度时调整(见 wrap_progress)。
+    已启动的 dataloader 子进程不受调整影响
+    """
+
+    def __init__(self, run_id: str):
+        super().__init__(name=f"cpu-budget-{run_id}", daemon=True)
+        self.run_id = run_id
+        self.budget = None
+        self._applied = None  # 训练线程已应用线程数的配额
+        self._stopped = threading.Event()
+        self._redis = redis.Redis(connection_pool=REDIS_POOL)
+
+    def _active_runs(self) -> list:
+        r = self._redis
+        run_ids = [m.decode() for m in r.zrange(f"cpu:runs:{HOSTNAME}", 0, -1)]
+        with r.pipeline() as pipe:
+            for run_id in run_ids:
+                pipe.exists(f"cpu:alive:{HOSTNAME}:{run_id}")
+            alive = pipe.execute()
+        stale = [run_id for run_id, ok in zip(run_ids, alive) if not ok]
+        if stale:
+            r.zrem(f"cpu:runs:{HOSTNAME}", *stale)
+        return [run_id for run_id, ok in zip(run_ids, alive) if ok]
+
+    def _rebalance(self) -> None:
+        self._redis.set(f"cpu:alive:{HOSTNAME}:{self.run_id}", 1, ex=_ALIVE_TTL)
+        runs = self._active_runs()
+        rank = runs.index(self.run_id) if self.run_id in runs else 0
+        budget = make_budget(_split_cores(NODE_CPUS, max(len(runs), 1), rank))
+        if budget["cpus"] != (self.budget or {}).get("cpus"):
+            _set_affinity(budget["cpus"])
+            logger.info(f"运行 {self.run_id} CPU配额: {budget['cores']} 核 {budget['cpus']} (节点并发 {len(runs)})")
+            # 仅在配额变化时替换, apply_pending 以对象是否变化判断是否需要调整线程数
+            self.budget = budget
+
+    def acquire(self) -> dict:
+        """登记当前运行并应用初始配额, 返回传给 nylab_train 的配额字典"""
+        with self._redis.pipeline() as pipe:
+            pipe.zadd(f"cpu:runs:{HOSTNAME}", {self.run_id: time.time()})
+            pipe.set(f"cpu:alive:{HOSTNAME}:{self.run_id}", 1, ex=_ALIVE_TTL)
+            pipe.execute()
+        self._rebalance()
+        self._applied = self.budget
+        _apply_threads(self._applied, first=True)
+        self.start()
+        return dict(self.budget)
+
+    def apply_pending(self) -> None:
+        """在训练线程中应用后台线程计算出的新线程数"""
+        budget = self.budget
+        if budget is not self._applied:
+            self._applied = budget
+            _apply_threads(budget, first=False)
+
+    def wrap_progress(self, update_progress):
+        """包装进度回调, 训练脚本每次上报进度时(在训练线程中)同步线程数"""
+        def callback(*args, **kwargs):
+            self.apply_pending()
+            return update_progress(*args, **kwargs)
+        return callback
+
+    def run(self):
+        while not self._stopped.wait(REBALANCE_SECONDS):
+            try:
+                self._rebalance()
+            except Exception as e:
+                logger.warning(f"CPU配额调整失败: {str(e)}")
+
+    def release(self) -> None:
+        """注销当前运行并恢复进程的线程配置(prefork子进程会被后续任务复用)"""
+        self._stopped.set()
+        with self._redis.pipeline() as pipe:
+            pipe.zrem(f"cpu:runs:{HOSTNAME}", self.run_id)
+            pipe.delete(f"cpu:alive:{HOSTNAME}:{self.run_id}")
+            pipe.execute()
+        if self.is_alive():
+            self.join()
+        budget = make_budget(NODE_CPUS)
+        _set_affinity(budget["cpus"])
+        _apply_threads(budget, first=False)
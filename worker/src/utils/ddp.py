@@ -0,0 +1,60 @@
+# 训练脚本使用的数据并行辅助函数
+# worker 在调用 nylab_train 前已初始化进程组(gloo, CPU), 并传入 distributed={"rank", "world_size", "backend"};
+# 单worker训练时 distributed 为空, 以下函数均退化为单进程的等价操作, 同一脚本可同时用于两种模式
+
+
+def wrap_model(model, distributed: dict = None):
+    """将模型包装为 DistributedDataParallel, 反向传播时在各rank间同步(平均)梯度
+
+    各rank的数据分片大小不同, 每个epoch的训练步数需先用 min_across_ranks 对齐,
+    否则步数多的rank会在梯度同步处一直等待
+    """
+    if not distributed:
+        return model
+    from torch.nn.parallel import DistributedDataParallel
+
+    return DistributedDataParallel(model)
+
+
+def unwrap_model(model):
+    """取出被 wrap_model 包装的原始模型, 用于保存与导出"""
+    return getattr(model, "module", model)
+
+
+def sum_across_ranks(values: dict, distributed: dict = None) -> dict:
+    """对各rank的计数求和(如验证集的正确数与样本数), 每个rank得到相同的结果
+
+    验证集同样被分片时, 先求和计数再计算比例, 得到的即是完整验证集上的指标
+    """
+    if not distributed:
+        return dict(values)
+    import torch
+    import torch.distributed as dist
+
+    names = sorted(values)
+    tensor = torch.tensor([float(values[name]) for name in names], dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return dict(zip(names, tensor.tolist()))
+
+
+def min_across_ranks(value: int, distributed: dict = None) -> int:
+    """各rank中的最小值, 用于对齐每个epoch的训练步数"""
+    if not distributed:
+        return value
+    import torch
+    import torch.distributed as dist
+
+    tensor = torch.tensor([value], dtype=torch.int64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.MIN)
+    return int(tensor.item())
+
+
+def union_across_ranks(items, distributed: dict = None) -> list:
+    """各rank的集合的并集(排序后返回), 用于统一类别列表等只在部分分片中出现的信息"""
+    if not distributed:
+        return sorted(set(items))
+    import torch.distributed as dist
+
+    gathered = [None] * distributed["world_size"]
+    dist.all_gather_object(gathered, sorted(set(items)))
+    return sorted(set().union(*gathered))
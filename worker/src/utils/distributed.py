@@ -0,0 +1,227 @@
+import os
+import time
+import socket
+import logging
+import zlib
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor
+import redis
+from minio import Minio
+from backend_common.cancellation import is_cancel_requested
+from backend_common.yolo_dataset import is_image, dataset_root, split_paths, list_file_paths
+from .progress import REDIS_POOL
+from .cancellation import RunCancelled
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 分布式训练的暂存桶, 与 archive_dataset 的临时数据集桶分开, 避免被其清理
+DISTRIBUTED_STAGING_BUCKET = "distributed-staging"
+# 等待全部rank就位(即占满N个worker槽位)的超时时间
+DDP_RENDEZVOUS_TIMEOUT = float(os.getenv("DDP_RENDEZVOUS_TIMEOUT", 600))
+DDP_DOWNLOAD_WORKERS = int(os.getenv("DDP_DOWNLOAD_WORKERS", 8))
+
+
+class DistributedAborted(Exception):
+    """分布式训练组中有rank失败或就位超时"""
+
+
+def _key(run_id: str, name: str) -> str:
+    return f"ddp:{run_id}:{name}"
+
+
+def abort_group(run_id: str, reason: str) -> None:
+    """通知训练组中的其他rank放弃等待"""
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    r.set(_key(run_id, "abort"), reason, ex=int(DDP_RENDEZVOUS_TIMEOUT) * 2)
+
+
+def _master_address() -> tuple:
+    addr = os.getenv("DDP_MASTER_ADDR") or socket.gethostbyname(socket.gethostname())
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("", 0))
+        port = s.getsockname()[1]
+    return addr, port
+
+
+def rendezvous(run_id: str, rank: int, world_size: int) -> tuple:
+    """通过Redis等待全部rank就位, 返回rank 0的 (地址, 端口)
+
+    先就位的rank占着worker槽位等待, 全部到齐即相当于为本次提交预留了N个槽位
+    """
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    ttl = int(DDP_RENDEZVOUS_TIMEOUT) * 2
+    with r.pipeline() as pipe:
+        pipe.sadd(_key(run_id, "joined"), rank)
+        pipe.expire(_key(run_id, "joined"), ttl)
+        pipe.execute()
+    if rank == 0:
+        addr, port = _master_address()
+        r.set(_key(run_id, "master"), f"{addr}:{port}", ex=ttl)
+
+    deadline = time.time() + DDP_RENDEZVOUS_TIMEOUT
+    while True:
+        abort = r.get(_key(run_id, "abort"))
+        if abort is not None:
+            raise DistributedAborted(abort.decode())
+        if is_cancel_requested(run_id):
+            raise RunCancelled(f"运行已取消: {run_id}")
+        with r.pipeline() as pipe:
+            pipe.scard(_key(run_id, "joined"))
+            pipe.get(_key(run_id, "master"))
+            joined, master = pipe.execute()
+        if joined >= world_size and master is not None:
+            addr, port = master.decode().rsplit(":", 1)
+            return addr, int(port)
+        if time.time() > deadline:
+            abort_group(run_id, f"等待rank就位超时: {joined}/{world_size}")
+            raise DistributedAborted(f"等待rank就位超时: {joined}/{world_size}")
+        time.sleep(1)
+
+
+def cleanup_group(run_id: str) -> None:
+    r = redis.Redis(connection_pool=REDIS_POOL)
+    r.delete(_key(run_id, "joined"), _key(run_id, "master"))
+
+
+def _shard_key(object_name: str) -> str:
+    """图片与其标签使用相同的分片键(ultralytics 约定: images -> labels, 扩展名 .txt)"""
+    return os.path.splitext(object_name.replace("/images/", "/labels/"))[0]
+
+
+def _val_keys(minio_client: Minio, datasets_prefix: str, object_names: list) -> tuple:
+    """解析 dataset.yaml 的 val 条目, 返回 (验证集目录的分片键前缀, 验证集列表文件中的分片键)
+
+    无 dataset.yaml 或无法解析时返回空结果, 此时所有图片都参与分片
+    """
+    import yaml
+
+    yaml_name = f"{datasets_prefix}dataset.yaml"
+    if yaml_name not in object_names:
+        return (), set()
+    response = minio_client.get_object(DISTRIBUTED_STAGING_BUCKET, yaml_name)
+    try:
+        data = yaml.safe_load(response.read()) or {}
+    except yaml.YAMLError as e:
+        logger.warning(f"dataset.yaml 解析失败, 验证集也将分片: {e}")
+        return (), set()
+    finally:
+        response.close()
+        response.release_conn()
+
+    # 按与训练时相同的规则在对象名上解析路径: 对象存在, 或是某些对象的目录前缀
+    names = set(object_names)
+    dirs = set()
+    for name in object_names:
+        parent = os.path.dirname(name)
+        while parent and parent not in dirs:
+            dirs.add(parent)
+            parent = os.path.dirname(parent)
+    dataset_dir = datasets_prefix.rstrip("/")
+    root, _ = dataset_root(data, dataset_dir, isdir=dirs.__contains__)
+    prefixes, keys = [], set()
+    for path in split_paths(data, "val", root, exists=lambda p: p in names or p in dirs):
+        if path in names and path.endswith(".txt"):
+            response = minio_client.get_object(DISTRIBUTED_STAGING_BUCKET, path)
+            try:
+                lines = response.read().decode().splitlines()
+            finally:
+                response.close()
+                response.release_conn()
+            keys.update(_shard_key(name) for name in list_file_paths(path, lines, dataset_dir))
+        else:
+            prefixes.append(_shard_key(f"{path}/x")[:-1])
+    return tuple(prefixes), keys
+
+
+def shard_objects(object_names: list, rank: int, world_size: int, val_keys: tuple = ((), set())) -> list:
+    """按分片键将训练集的图片/标签对分配给各rank
+
+    验证集(val_keys, 见 _val_keys)与其他文件(如 dataset.yaml)每个rank都保留完整一份,
+    rank 0 的验证指标因此覆盖整个验证集
+    """
+    val_prefixes, val_files = val_keys
+    images = {_shard_key(name) for name in object_names if is_image(name)}
+    selected = []
+    for name in object_names:
+        key = _shard_key(name)
+        is_val = key in val_files or key.startswith(val_prefixes)
+        if key in images and not is_val and zlib.crc32(key.encode()) % world_size != rank:
+            continue
+        selected.append(name)
+    return selected
+
+
+def stage_shard(
+    minio_client: Minio,
+    run_id: str,
+    rank: int,
+    world_size: int,
+    local_dir: str
+) -> tuple:
+    """从暂存桶并行下载本rank的数据分片与训练脚本
+
+    Returns:
+        (本地数据集路径, 本地脚本路径)
+    """
+    prefix = f"{run_id}/"
+    object_names = [
+        obj.object_name for obj in
+        minio_client.list_objects(DISTRIBUTED_STAGING_BUCKET, prefix=prefix, recursive=True)
+    ]
+    dataset_objects = [name for name in object_names if name.startswith(f"{prefix}datasets/")]
+    script_objects = [name for name in object_names if name.startswith(f"{prefix}script/")]
+    if not script_objects:
+        raise FileNotFoundError(f"暂存桶中缺少训练脚本: {prefix}script/")
+    val_keys = _val_keys(minio_client, f"{prefix}datasets/", dataset_objects)
+    selected = shard_objects(dataset_objects, rank, world_size, val_keys) + script_objects[:1]
+
+    def download(object_name):
+        local_path = os.path.join(local_dir, object_name[len(prefix):])
+        os.makedirs(os.path.dirname(local_path), exist_ok=True)
+        minio_client.fget_object(DISTRIBUTED_STAGING_BUCKET, object_name, local_path)
+
+    with ThreadPoolExecutor(max_workers=DDP_DOWNLOAD_WORKERS) as pool:
+        list(pool.map(download, selected))
+    logger.info(f"rank {rank}/{world_size} 暂存分片完成: {len(selected)} 个文件")
+    return (
+        os.path.join(local_dir, "datasets"),
+        os.path.join(local_dir, script_objects[0][len(prefix):])
+    )
+
+
+def remove_staging(minio_client: Minio, run_id: str) -> None:
+    """删除暂存桶中本次运行的数据(由rank 0在训练结束后调用)"""
+    for obj in minio_client.list_objects(DISTRIBUTED_STAGING_BUCKET, prefix=f"{run_id}/", recursive=True):
+        minio_client.remove_object(DISTRIBUTED_STAGING_BUCKET, obj.object_name)
+
+
+def init_process_group(addr: str, port: int, rank: int, world_size: int) -> None:
+    """以gloo后端(CPU)初始化进程组, 同时设置 torch.distributed 约定的环境变量"""
+    import torch.distributed as dist
+
+    os.environ.update({
+        "MASTER_ADDR": addr,
+        "MASTER_PORT": str(port),
+        "RANK": str(rank),
+        "WORLD_SIZE": str(world_size),
+        "LOCAL_RANK": "0"
+    })
+    dist.init_process_group(
+        backend="gloo",
+        init_method=f"tcp://{addr}:{port}",
+        rank=rank,
+        world_size=world_size,
+        timeout=timedelta(seconds=DDP_RENDEZVOUS_TIMEOUT)
+    )
+
+
+def destroy_process_group() -> None:
+    import torch.distributed as dist
+
+    if dist.is_initialized():
+        dist.destroy_process_group()
+    for name in ("MASTER_ADDR", "MASTER_PORT", "RANK", "WORLD_SIZE", "LOCAL_RANK"):
+        os.environ.pop(name, None)
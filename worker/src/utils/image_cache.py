@@ -0,0 +1,237 @@
+import os
+import json
+import math
+import fcntl
+import shutil
+import hashlib
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from backend_common.yolo_dataset import is_image
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 预处理缓存根目录, 位于共享卷上, 同一节点的多个训练共用
+IMAGE_CACHE_ROOT = os.getenv("NYLAB_IMAGE_CACHE_DIR", "/data/.cache/images")
+# 缓存总大小上限, 超过时按最近使用时间淘汰(共享卷的准入控制不为缓存单独预留空间)
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("NYLAB_IMAGE_CACHE_MAX_BYTES", 20 * 1024 ** 3))
+
+
+def _list_images(dataset_path: str) -> list:
+    """按稳定顺序列出数据集中的全部图片(相对路径)"""
+    images = []
+    for root, _, files in os.walk(dataset_path):
+        for file in files:
+            if is_image(file):
+                images.append(os.path.relpath(os.path.join(root, file), dataset_path))
+    return sorted(images)
+
+
+def dataset_hash(dataset_path: str, images: list = None) -> str:
+    """计算数据集图片内容的哈希, 与 run_id 所在目录无关
+
+    每次训练都会把数据集复制到新的 /data/{run_id}, 因此只能按内容而不能按路径/修改时间识别
+    """
+    images = images if images is not None else _list_images(dataset_path)
+    digest = hashlib.blake2b(digest_size=16)
+    for rel_path in images:
+        digest.update(rel_path.encode())
+        with open(os.path.join(dataset_path, rel_path), "rb") as f:
+            while chunk := f.read(1024 * 1024):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _decode_resize(path: str, imgsz: int):
+    """解码并按长边缩放到 imgsz (与 ultralytics 的 rect_mode 语义一致)"""
+    import cv2
+
+    im = cv2.imread(path)
+    if im is None:
+        raise FileNotFoundError(f"无法解码图片: {path}")
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz)
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return np.ascontiguousarray(im), (h0, w0)
+
+
+class ImageCache:
+    """只读的预处理图片缓存
+
+    data.bin 为所有缩放后图片的连续 uint8 数据, 以 np.memmap 只读映射,
+    同一节点上的并发训练共享同一份页缓存; index.json 记录每张图片的偏移与尺寸
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = cache_dir
+        index_path = os.path.join(cache_dir, "index.json")
+        with open(index_path, "r") as f:
+            meta = json.load(f)
+        # 以 index.json 的修改时间作为最近使用时间, 供 prune_image_cache 淘汰
+        os.utime(index_path)
+        self.imgsz = meta["imgsz"]
+        self.index = meta["images"]
+        self.data = np.memmap(os.path.join(cache_dir, "data.bin"), dtype=np.uint8, mode="r")
+
+    def __len__(self):
+        return len(self.index)
+
+    def __contains__(self, rel_path: str):
+        return rel_path in self.index
+
+    def get(self, rel_path: str):
+        """返回 (图片视图, 原始尺寸(h0, w0), 缩放后尺寸(h, w))
+
+        返回的数组为只读视图, 需要原地修改时请自行 copy
+        """
+        entry = self.index[rel_path]
+        h, w = entry["shape"]
+        im = self.data[entry["offset"]:entry["offset"] + h * w * 3].reshape(h, w, 3)
+        return im, tuple(entry["shape0"]), (h, w)
+
+
+def build_image_cache(dataset_path: str, imgsz: int, workers: int = None) -> ImageCache:
+    """为数据集构建(或复用)预处理缓存, 每个 (数据集哈希, imgsz) 只解码一次
+
+    Args:
+        dataset_path: 数据集路径
+        imgsz: 训练输入尺寸(长边)
+        workers: 解码线程数, 默认使用 CPU 核数
+    Returns:
+        ImageCache 实例
+    """
+    images = _list_images(dataset_path)
+    cache_dir = os.path.join(IMAGE_CACHE_ROOT, f"{dataset_hash(dataset_path, images)}_{imgsz}")
+    if os.path.exists(os.path.join(cache_dir, "index.json")):
+        try:
+            cache = ImageCache(cache_dir)
+            logger.info(f"复用预处理缓存: {cache_dir}")
+            return cache
+        except FileNotFoundError:
+            pass  # 恰好被淘汰, 重新构建
+
+    os.makedirs(IMAGE_CACHE_ROOT, exist_ok=True)
+    # 文件锁保证同一节点上同一数据集只有一个训练在构建缓存
+    with open(f"{cache_dir}.lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if os.path.exists(os.path.join(cache_dir, "index.json")):
+                return ImageCache(cache_dir)
+
+            tmp_dir = f"{cache_dir}.tmp-{os.getpid()}"
+            os.makedirs(tmp_dir, exist_ok=True)
+            index = {}
+            offset = 0
+            paths = [os.path.join(dataset_path, rel_path) for rel_path in images]
+            with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+                    open(os.path.join(tmp_dir, "data.bin"), "wb") as data_file:
+                # cv2 解码/缩放释放 GIL, 线程池即可并行; map 保证顺序写入
+                for rel_path, (im, shape0) in zip(images, pool.map(lambda p: _decode_resize(p, imgsz), paths)):
+                    data_file.write(im.tobytes())
+                    index[rel_path] = {
+                        "offset": offset,
+                        "shape": list(im.shape[:2]),
+                        "shape0": list(shape0)
+                    }
+                    offset += im.nbytes
+            with open(os.path.join(tmp_dir, "index.json"), "w") as f:
+                json.dump({"imgsz": imgsz, "images": index}, f)
+
+            os.replace(tmp_dir, cache_dir)
+            logger.info(f"预处理缓存构建完成: {cache_dir}, 共 {len(index)} 张图片, {offset} 字节")
+            cache = ImageCache(cache_dir)
+        except Exception:
+            shutil.rmtree(f"{cache_dir}.tmp-{os.getpid()}", ignore_errors=True)
+            raise
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    prune_image_cache(keep=cache_dir)
+    return cache
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, files in os.walk(path)
+        for name in files
+    )
+
+
+def prune_image_cache(keep: str = None, max_bytes: int = IMAGE_CACHE_MAX_BYTES) -> None:
+    """按最近使用时间淘汰缓存, 使总大小不超过上限
+
+    正在构建的缓存持有文件锁, 跳过; 已被其他训练 memmap 的缓存删除后映射仍然有效
+    """
+    entries = []
+    for name in os.listdir(IMAGE_CACHE_ROOT):
+        path = os.path.join(IMAGE_CACHE_ROOT, name)
+        index_path = os.path.join(path, "index.json")
+        if ".tmp-" in name or not os.path.exists(index_path):
+            continue
+        entries.append((os.stat(index_path).st_mtime, path, _dir_bytes(path)))
+    total = sum(size for _, _, size in entries)
+    for _, path, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        with open(f"{path}.lock", "w") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                continue
+            try:
+                shutil.rmtree(path, ignore_errors=True)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        total -= size
+        logger.info(f"淘汰预处理缓存: {path} ({size} 字节)")
+
+
+@contextmanager
+def ultralytics_cache_hook(cache: ImageCache, dataset_path: str):
+    """在上下文内让 ultralytics 数据集从预处理缓存读取图片, 替代每个 epoch 的 JPEG 解码
+
+    仅在 rect_mode、三通道且缓存尺寸与数据集 imgsz 一致时命中, 其他情况回退到原始实现;
+    命中时与原始实现一样维护 ims/im_hw0/im_hw 与 buffer(Mosaic 从 buffer 中选取拼接图片)。
+    Celery worker 子进程会被后续运行复用, 退出上下文时恢复原始实现
+    """
+    from ultralytics.data.base import BaseDataset
+
+    original_load_image = BaseDataset.load_image
+    dataset_root = os.path.abspath(dataset_path)
+
+    def load_image(self, i, rect_mode=True, *args, **kwargs):
+        imgsz = max(self.imgsz) if isinstance(self.imgsz, (tuple, list)) else self.imgsz
+        if (
+            self.ims[i] is None
+            and rect_mode
+            and not args and not kwargs.get("resize_short")
+            and imgsz == cache.imgsz
+            and getattr(self, "channels", 3) == 3
+        ):
+            rel_path = os.path.relpath(os.path.abspath(self.im_files[i]), dataset_root)
+            if rel_path in cache:
+                im, shape0, shape = cache.get(rel_path)
+                # 数据增强可能原地修改图片, 返回副本
+                im = im.copy()
+                if self.augment and self.cache != "ram":
+                    self.ims[i], self.im_hw0[i], self.im_hw[i] = im, shape0, shape
+                    self.buffer.append(i)
+                    if 1 < len(self.buffer) >= self.max_buffer_length:
+                        j = self.buffer.pop(0)
+                        self.ims[j], self.im_hw0[j], self.im_hw[j] = None, None, None
+                return im, shape0, shape
+        return original_load_image(self, i, rect_mode, *args, **kwargs)
+
+    BaseDataset.load_image = load_image
+    try:
+        yield
+    finally:
+        BaseDataset.load_image = original_load_image
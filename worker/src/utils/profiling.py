@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 采样间隔与内存快照保留的分配位置数
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 10))
+PROFILE_TOP_ALLOCATIONS = 30
+
+
+class StackSampler(threading.Thread):
+    """对目标线程进行周期性栈采样, 输出 py-spy/flamegraph.pl 兼容的 collapsed stacks
+
+    只在采样时读取一次目标线程的栈帧, 开销与采样频率成正比, 与被测代码的调用次数无关
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        super().__init__(name="stack-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class NullProfiler:
+    """未开启性能分析时使用, 各阶段不做任何额外工作"""
+
+    enabled = False
+
+    @contextmanager
+    def phase(self, name: str):
+        yield
+
+    def torch_step(self):
+        return None
+
+    def finish(self) -> None:
+        return None
+
+
+class RunProfiler:
+    """按阶段采集性能数据: 栈采样、可选的 cProfile、tracemalloc 峰值内存与可选的 torch CPU profiler
+
+    输出到 out_dir:
+        {阶段}.collapsed   栈采样结果, 可直接用 flamegraph.pl / speedscope 打开
+        {阶段}.pstats      cProfile 统计(开启时)
+        {阶段}.memory.txt  阶段内存峰值与分配最多的位置
+        torch_trace.json / torch_stacks.txt  torch CPU profiler 结果(开启时)
+        summary.json       各阶段耗时与内存峰值汇总
+    """
+
+    enabled = True
+
+    def __init__(self, out_dir: str, use_cprofile: bool = False, torch_steps: int = 0,
+                 interval_ms: float = PROFILE_INTERVAL_MS):
+        self.out_dir = out_dir
+        self.use_cprofile = use_cprofile
+        self.torch_steps = torch_steps
+        self.interval = interval_ms / 1000
+        self.summary = {}
+        self._torch_profiler = None
+        os.makedirs(out_dir, exist_ok=True)
+        tracemalloc.start()
+
+    @contextmanager
+    def phase(self, name: str):
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        profile = cProfile.Profile() if self.use_cprofile else None
+        tracemalloc.reset_peak()
+        started = time.perf_counter()
+        sampler.start()
+        if profile:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile:
+                profile.disable()
+                profile.dump_stats(os.path.join(self.out_dir, f"{name}.pstats"))
+            sampler.stop()
+            elapsed = time.perf_counter() - started
+            sampler.write_collapsed(os.path.join(self.out_dir, f"{name}.collapsed"))
+            current, peak = tracemalloc.get_traced_memory()
+            self._write_memory(name, tracemalloc.take_snapshot(), peak)
+            self.summary[name] = {
+                "seconds": elapsed,
+                "samples": sum(sampler.stacks.values()),
+                "peak_traced_bytes": peak,
+                "current_traced_bytes": current
+            }
+
+    def _write_memory(self, name: str, snapshot, peak: int) -> None:
+        stats = snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+        with open(os.path.join(self.out_dir, f"{name}.memory.txt"), "w") as f:
+            f.write(f"peak traced memory: {peak} bytes\n\n")
+            for stat in stats:
+                f.write(f"{stat}\n")
+
+    def torch_step(self):
+        """返回供训练脚本每个训练步调用的回调, 在前几步之后记录 torch_steps 个步骤
+
+        未开启 torch profiler 或环境中没有 torch 时返回 None
+        """
+        if self.torch_steps <= 0:
+            return None
+        try:
+            import torch
+        except ImportError:
+            return None
+
+        def on_trace_ready(prof):
+            prof.export_chrome_trace(os.path.join(self.out_dir, "torch_trace.json"))
+            prof.export_stacks(os.path.join(self.out_dir, "torch_stacks.txt"), "self_cpu_time_total")
+
+        self._torch_profiler = torch.profiler.profile(
+            activities=[torch.profiler.ProfilerActivity.CPU],
+            schedule=torch.profiler.schedule(wait=1, warmup=1, active=self.torch_steps, repeat=1),
+            on_trace_ready=on_trace_ready,
+            with_stack=True,
+            profile_memory=True
+        )
+        self._torch_profiler.start()
+        return self._torch_profiler.step
+
+    def finish(self) -> str:
+        """停止所有采集并写出汇总, 返回输出目录"""
+        if self._torch_profiler is not None:
+            self._torch_profiler.stop()
+            self._torch_profiler = None
+        tracemalloc.stop()
+        with open(os.path.join(self.out_dir, "summary.json"), "w") as f:
+            json.dump(self.summary, f, indent=2)
+        logger.info(f"性能分析完成: {self.summary}")
+        return self.out_dir
+
+
+def create_profiler(task_config: dict, out_dir: str):
+    """按训练配置创建性能分析器, 未开启时返回无开销的 NullProfiler"""
+    if not task_config.get("profile_run", False):
+        return NullProfiler()
+    return RunProfiler(
+        out_dir,
+        use_cprofile=task_config.get("profile_cprofile", False),
+        torch_steps=task_config.get("profile_torch_steps") or 0
+    )
@@ -0,0 +1,284 @@
+import io
+import os
+import time
+import shutil
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from minio import Minio
+from backend_common.space_manager import STREAM_CACHE_BYTES
+
+# 配置日志
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+logger.addHandler(logging.StreamHandler())
+
+# 分块大小: 小于该大小的对象(如单张图片)为一个块, 大文件(如tar分片)按块范围读取
+STREAM_BLOCK_SIZE = int(os.getenv("STREAM_BLOCK_SIZE", 8 * 1024 * 1024))
+# 预读窗口(字节), 不超过块缓存上限的一半, 避免预读的块在被读取前就被淘汰
+STREAM_READ_AHEAD_BYTES = int(os.getenv("STREAM_READ_AHEAD_BYTES", 256 * 1024 * 1024))
+STREAM_PREFETCH_WORKERS = int(os.getenv("STREAM_PREFETCH_WORKERS", 8))
+
+
+class BlockCache:
+    """本地磁盘上的有界LRU块缓存, 同一块的并发请求(预读与训练读取)只下载一次"""
+
+    def __init__(self, minio_client: Minio, bucket: str, cache_dir: str, capacity: int):
+        self.minio_client = minio_client
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.capacity = capacity
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fetched_bytes = 0
+        self._entries = OrderedDict()  # (对象名, 块序号) -> 块大小
+        self._inflight = {}  # (对象名, 块序号) -> Future
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.cache_dir, hashlib.sha1(f"{key[0]}#{key[1]}".encode()).hexdigest())
+
+    def _download(self, key: tuple, length: int) -> bytes:
+        response = self.minio_client.get_object(
+            self.bucket, key[0], offset=key[1] * STREAM_BLOCK_SIZE, length=length
+        )
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _evict(self) -> None:
+        """淘汰最久未使用的块直到不超过上限, 调用方需持有锁"""
+        while self.used > self.capacity and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.used -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, key: tuple, length: int) -> bytes:
+        """读取一个块, 未命中时从MinIO下载并写入缓存
+
+        Args:
+            key: (对象名, 块序号)
+            length: 块大小
+        """
+        with self._lock:
+            hit = key in self._entries
+            if hit:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        # 命中时在锁外读取文件, 避免磁盘读取串行化其他线程的查找与预读
+        if hit:
+            try:
+                with open(self._path(key), "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                # 读取前已被其他线程淘汰, 按未命中重新下载
+                pass
+
+        with self._lock:
+            if hit:
+                self.hits -= 1
+                if key in self._entries and not os.path.exists(self._path(key)):
+                    self.used -= self._entries.pop(key)
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                self.misses += 1
+        if not owner:
+            return future.result()
+
+        try:
+            data = self._download(key, length)
+            with open(self._path(key), "wb") as f:
+                f.write(data)
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._inflight.pop(key, None)
+            # 读取失败后重新下载时, 其他线程可能已重新缓存该块, 不能重复计入用量
+            self.used += len(data) - self._entries.get(key, 0)
+            self._entries[key] = len(data)
+            self.fetched_bytes += len(data)
+            self._evict()
+        future.set_result(data)
+        return data
+
+    def cached(self, key: tuple) -> bool:
+        with self._lock:
+            return key in self._entries or key in self._inflight
+
+
+class StreamingDataset:
+    """直接从MinIO存储桶读取的数据集句柄, 传给训练脚本的 dataset 参数
+
+    对象按需读取, 后台线程按访问顺序预读后续对象, 首批对象到达即可开始训练;
+    本地只保留有界的块缓存, 磁盘占用不随数据集大小增长
+
+    用法(训练脚本):
+        for name, data in dataset:        # 按当前顺序顺序读取, 命中预读
+            ...
+        dataset.shuffle(seed=epoch)       # 每个epoch打乱顺序, 预读跟随新顺序
+        dataset.read("labels/0001.txt")   # 随机读取单个对象
+        dataset.local_path("dataset.yaml")  # 需要文件路径的小文件, 下载后常驻本地
+    """
+
+    def __init__(
+        self,
+        minio_client: Minio,
+        bucket: str,
+        prefix: str,
+        cache_dir: str,
+        cache_bytes: int = STREAM_CACHE_BYTES,
+        read_ahead_bytes: int = STREAM_READ_AHEAD_BYTES,
+        workers: int = STREAM_PREFETCH_WORKERS
+    ):
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.read_ahead_bytes = min(read_ahead_bytes, cache_bytes // 2)
+        self._created = time.monotonic()
+        self._first_read = None
+        self._cache = BlockCache(minio_client, bucket, os.path.join(cache_dir, "blocks"), cache_bytes)
+        self._files_dir = os.path.join(cache_dir, "files")
+        self._minio_client = minio_client
+
+        # 前缀可以是单个对象或文件夹, 对象名统一为相对于数据集根目录的路径
+        prefix = prefix.rstrip("/")
+        objects = list(minio_client.list_objects(bucket, prefix=f"{prefix}/", recursive=True))
+        if objects:
+            root = f"{prefix}/"
+        else:
+            objects = list(minio_client.list_objects(bucket, prefix=prefix))
+            objects = [obj for obj in objects if obj.object_name == prefix]
+            root = prefix[:prefix.rfind("/") + 1]
+        if not objects:
+            raise FileNotFoundError(f"数据集不存在: {bucket}/{prefix}")
+        self._objects = {obj.object_name[len(root):]: (obj.object_name, obj.size) for obj in objects}
+        self.names = sorted(self._objects)
+
+        self._lock = threading.Lock()
+        self._order = list(self.names)
+        self._positions = {name: i for i, name in enumerate(self._order)}
+        self._scheduled = 0  # 已提交预读的顺序位置(不含)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stream-prefetch")
+        self._closed = False
+        self._prefetch(0)
+        logger.info(f"流式数据集: {bucket}/{root}, {len(self.names)} 个对象, 块缓存上限 {cache_bytes} 字节")
+
+    def __len__(self) -> int:
+        return len(self._order)
+
+    def __getitem__(self, index: int) -> bytes:
+        return self.read(self._order[index])
+
+    def __iter__(self):
+        for name in list(self._order):
+            yield name, self.read(name)
+
+    def size(self, name: str) -> int:
+        return self._objects[name][1]
+
+    def _blocks(self, name: str) -> list:
+        object_name, size = self._objects[name]
+        count = max(1, -(-size // STREAM_BLOCK_SIZE))
+        return [
+            ((object_name, i), min(STREAM_BLOCK_SIZE, size - i * STREAM_BLOCK_SIZE))
+            for i in range(count)
+        ]
+
+    def _prefetch(self, position: int) -> None:
+        """从 position 开始按顺序提交预读, 直到预读窗口内的字节数达到上限"""
+        with self._lock:
+            if self._closed:
+                return
+            start = max(self._scheduled, position)
+            window = 0
+            index = position
+            while index < len(self._order) and window < self.read_ahead_bytes:
+                name = self._order[index]
+                window += self.size(name)
+                if index >= start:
+                    for key, length in self._blocks(name):
+                        self._pool.submit(self._prefetch_block, key, length)
+                index += 1
+            self._scheduled = max(self._scheduled, index)
+
+    def _prefetch_block(self, key: tuple, length: int) -> None:
+        if self._closed or self._cache.cached(key):
+            return
+        try:
+            self._cache.get(key, length)
+        except Exception as e:
+            # 预读失败不影响训练, 读取时会重新下载并抛出真实错误
+            logger.warning(f"预读失败: {key[0]}: {e}")
+
+    def read(self, name: str) -> bytes:
+        """读取对象的完整内容, 并推进预读窗口"""
+        if name not in self._objects:
+            raise FileNotFoundError(f"数据集中不存在: {name}")
+        position = self._positions.get(name)
+        if position is not None:
+            self._prefetch(position + 1)
+        data = b"".join(self._cache.get(key, length) for key, length in self._blocks(name))
+        if self._first_read is None:
+            self._first_read = time.monotonic()
+        return data
+
+    def open(self, name: str) -> io.BytesIO:
+        return io.BytesIO(self.read(name))
+
+    def shuffle(self, seed: int = None) -> list:
+        """打乱读取顺序(通常每个epoch调用一次), 预读从新顺序的开头重新开始"""
+        order = list(self.names)
+        random.Random(seed).shuffle(order)
+        with self._lock:
+            self._order = order
+            self._positions = {name: i for i, name in enumerate(order)}
+            self._scheduled = 0
+        self._prefetch(0)
+        return order
+
+    def local_path(self, name: str) -> str:
+        """下载对象到本地并返回路径, 用于需要文件路径的小文件(配置、标注索引等)
+
+        该目录不受块缓存上限约束, 不应用于批量的训练样本
+        """
+        path = os.path.join(self._files_dir, name)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._minio_client.fget_object(self.bucket, self._objects[name][0], path)
+        return path
+
+    def stats(self) -> dict:
+        cache = self._cache
+        return {
+            "objects": len(self.names),
+            "dataset_bytes": sum(size for _, size in self._objects.values()),
+            "fetched_bytes": cache.fetched_bytes,
+            "cache_used_bytes": cache.used,
+            "cache_hits": cache.hits,
+            "cache_misses": cache.misses,
+            "cache_evictions": cache.evictions,
+            "first_read_seconds": (self._first_read - self._created) if self._first_read else None
+        }
+
+    def close(self) -> None:
+        """停止预读并删除本地缓存"""
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)